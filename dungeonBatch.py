@@ -0,0 +1,288 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonBatch.py
+#   Description -   Python file to handle creating Dungeons in bulk from the command line, without the web server.
+#                   Jobs come from a seed range (with one set of parameters) or a sweep file (a JSON list of parameter sets),
+#                   and are spread across a pool of processes. Each Dungeon is written to the output folder as a PNG image
+#                   and a JSON file of its encounters.
+#                   Finished jobs are recorded in a checkpoint file in the output folder, so a stopped batch can be run again to carry on where it left off.
+#
+#                   Usage: python dungeonGeneration.py --seeds 1-1000 --size 3 --shape Square --corridor BSP --out maps
+#                          python dungeonGeneration.py --sweep sweep.json --out maps --workers 8
+#
+#                   Sweep file entries use the same names as the arguments (e.g {"seeds": "1-50", "size": "4", "corridor": "Drunkard", "theme": "undead"}),
+#                   and any parameter not given in an entry uses the value given on the command line.
+#
+#   Changelog   -   18/10/26    -   Created batch Dungeon generation
+#                               -   Custom Dungeon sizes (e.g --size 500x500) can now be used
+#                               -   Chunks of custom sized Dungeons can be created by more processes within each job (--chunk-workers)
+#                               -   Images of very large Dungeons are now written a band at a time
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dungeonExport import encounterData
+from dungeonTracing import log, setLogLevel, ERROR, INFO
+
+#Name of checkpoint file kept in output folder
+checkpointName = "checkpoint.jsonl"
+
+#Parameters of a job, and the command line default for each
+jobDefaults = {
+    "size": "2",
+    "shape": "Square",
+    "corridor": "BSP",
+    "tileset": "Stone",
+    "theme": "everything",
+    "partySize": 0,
+    "partyLevel": 0,
+    "density": "normal",
+    "roomSizing": "batch",
+    "corridorSteps": "batch",
+}
+
+#Method to check a seed can be used for a job
+#In -> Seed
+#Out -> Seed (raises ValueError if it is not greater than 0)
+def checkSeed(seed):
+    if seed <= 0:
+        raise ValueError("Seeds must be greater than 0 (0 means a random seed, which cannot be resumed)")
+    return seed
+
+#Method to read a list of seeds
+#In -> Text of comma separated seeds and ranges (e.g "1-100,250,300-310")
+#Out -> List of seeds
+def parseSeeds(text):
+    seeds = []
+    for part in str(text).split(","):
+        part = part.strip()
+        if part == "":
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            first = int(first)
+            last = int(last)
+            if last < first:
+                raise ValueError("Seed range {0} ends before it starts".format(part))
+            seeds.extend(range(first, last + 1))
+        else:
+            seeds.append(int(part))
+    return [checkSeed(seed) for seed in seeds]
+
+#Method to get the id of a job -> Same parameters always give the same id, so finished jobs can be found again
+#In -> Job (dictionary of parameters)
+#Out -> Job id (used as file name)
+def jobId(job):
+    canonical = json.dumps(job, sort_keys=True)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+    return "dungeon_{0}_{1}".format(job["seed"], digest)
+
+#Method to build the list of jobs from command line arguments
+#In -> Parsed arguments
+#Out -> List of jobs (dictionaries of parameters)
+def buildJobs(args):
+    defaults = {}
+    for name in jobDefaults:
+        defaults[name] = getattr(args, name)
+
+    #Each entry gives a set of seeds and the parameters to use for them
+    entries = []
+    if args.sweep != None:
+        with open(args.sweep) as f:
+            sweep = json.load(f)
+        if not isinstance(sweep, list):
+            raise ValueError("Sweep file must hold a JSON list of parameter sets")
+        for entry in sweep:
+            unknown = set(entry) - set(jobDefaults) - {"seed", "seeds", "popSeed"}
+            if unknown != set():
+                raise ValueError("Unknown sweep parameters: {0}".format(", ".join(sorted(unknown))))
+            entries.append(entry)
+    else:
+        entries.append({"seeds": args.seeds})
+
+    jobs = []
+    seen = set()
+    for entry in entries:
+        if "seed" in entry:
+            seeds = [checkSeed(int(entry["seed"]))]
+        else:
+            seeds = parseSeeds(entry.get("seeds", args.seeds))
+        for seed in seeds:
+            job = dict(defaults)
+            job.update({name: value for name, value in entry.items() if name in jobDefaults})
+            job["size"] = str(job["size"])
+            job["partySize"] = int(job["partySize"])
+            job["partyLevel"] = int(job["partyLevel"])
+            job["seed"] = seed
+            #Population seed matches Dungeon seed unless given, so every job can be made again
+            job["popSeed"] = int(entry.get("popSeed", args.popSeed if args.popSeed != None else seed))
+            key = jobId(job)
+            if key not in seen:
+                seen.add(key)
+                jobs.append(job)
+    return jobs
+
+#Method to read ids of finished jobs from the checkpoint file
+#In -> Output folder
+#Out -> Set of job ids
+def readCheckpoint(folder):
+    finished = set()
+    path = os.path.join(folder, checkpointName)
+    if not os.path.exists(path):
+        return finished
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                #Last line may be partly written if the batch was stopped
+                continue
+            #Only count jobs whose files are still there
+            if os.path.exists(os.path.join(folder, record["id"] + ".png")) and os.path.exists(os.path.join(folder, record["id"] + ".json")):
+                finished.add(record["id"])
+    return finished
+
+#Method to write a file so it is never left partly written
+#In -> Path, Bytes (or iterable of bytes, written as they are produced)
+#Out -> None
+def writeFile(path, data):
+    if isinstance(data, bytes):
+        data = [data]
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        for part in data:
+            f.write(part)
+    os.replace(temp, path)
+
+#Method to set up each worker process
+#In -> Log level
+#Out -> None
+def initWorker(level):
+    setLogLevel(level)
+
+#Method to create one Dungeon and write its image and encounters (run in a worker process)
+#In -> Job (dictionary of parameters), Output folder, Number of processes used to create chunks of custom sized Dungeons
+#Out -> Job id, Seconds taken
+def runJob(job, folder, chunkWorkers = 1):
+    import dungeonGeneration
+    from dungeonRendering import streamImage
+    from dungeonTracing import PhaseTracer
+    start = time.perf_counter()
+    key = jobId(job)
+    tracer = PhaseTracer()
+    dungeon, dunSeed = dungeonGeneration.getDungeon(job["size"], job["shape"], job["corridor"], job["seed"], job["tileset"],
+                                                    tracer, job["roomSizing"], UseCache = False, Workers = chunkWorkers,
+                                                    CorridorSteps = job["corridorSteps"])
+    encounters, popSeed, partySize, partyLevel = dungeonGeneration.populateRooms(dungeon.getRooms(), job["popSeed"], job["theme"],
+                                                                                 job["partySize"], job["partyLevel"], job["density"], tracer)
+    data = {
+        "id": key,
+        "parameters": job,
+        "dungeonSeed": int(dunSeed),
+        "populationSeed": int(popSeed),
+        "partySize": partySize,
+        "partyLevel": partyLevel,
+        "encounters": [encounterData(encounter) for encounter in encounters],
+        "timings": tracer.getReport(),
+    }
+    #Very large Dungeons have no image kept in memory -> Image is drawn and written a band at a time
+    image = dungeon.getImage()
+    if image == None:
+        image = streamImage(dungeon.getGrid(), dungeon.getRooms(), job["tileset"])
+    writeFile(os.path.join(folder, key + ".png"), image)
+    writeFile(os.path.join(folder, key + ".json"), json.dumps(data, indent=2).encode("utf-8"))
+    return key, time.perf_counter() - start
+
+#Method to run every job that has not already finished, across a pool of processes
+#In -> List of jobs, Output folder, Number of worker processes, Number of jobs between progress messages,
+#      Number of processes each job uses to create chunks of custom sized Dungeons
+#Out -> Number of failed jobs
+def runJobs(jobs, folder, workers, progressEvery, chunkWorkers = 1):
+    os.makedirs(folder, exist_ok=True)
+    finished = readCheckpoint(folder)
+    pending = [job for job in jobs if jobId(job) not in finished]
+    log("{0} jobs, {1} already finished, {2} to run on {3} workers".format(len(jobs), len(jobs) - len(pending), len(pending), workers), INFO)
+    if pending == []:
+        return 0
+
+    failed = 0
+    done = 0
+    start = time.perf_counter()
+    #Only a few jobs are queued per worker at once, so large batches do not build a large queue in memory
+    maxQueued = workers * 4
+    queue = iter(pending)
+    running = {}
+    with open(os.path.join(folder, checkpointName), "a") as checkpoint:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(ERROR,)) as pool:
+            while True:
+                while len(running) < maxQueued:
+                    job = next(queue, None)
+                    if job == None:
+                        break
+                    running[pool.submit(runJob, job, folder, chunkWorkers)] = job
+                if running == {}:
+                    break
+                complete, notComplete = wait(running, return_when=FIRST_COMPLETED)
+                for future in complete:
+                    job = running.pop(future)
+                    done += 1
+                    try:
+                        key, seconds = future.result()
+                    except Exception as e:
+                        failed += 1
+                        log("Job {0} failed: {1!r}".format(jobId(job), e), ERROR)
+                        continue
+                    #Record job as finished only once both files are written
+                    checkpoint.write(json.dumps({"id": key, "seed": job["seed"], "seconds": round(seconds, 4)}) + "\n")
+                    checkpoint.flush()
+                    if done % progressEvery == 0 or done == len(pending):
+                        elapsed = time.perf_counter() - start
+                        rate = done / elapsed if elapsed > 0 else 0.0
+                        remaining = (len(pending) - done) / rate if rate > 0 else 0.0
+                        log("[{0}/{1}] {2:.1f} dungeons/s, {3:.0f}s remaining, {4} failed".format(done, len(pending), rate, remaining, failed), INFO)
+    return failed
+
+#Method to read command line arguments
+#In -> List of arguments
+#Out -> Parsed arguments
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Create Dungeons in bulk, writing a PNG image and JSON encounters for each")
+    jobs = parser.add_mutually_exclusive_group(required=True)
+    jobs.add_argument("--seeds", help="Dungeon seeds to create, e.g 1-1000 or 1,5,10-20")
+    jobs.add_argument("--sweep", help="JSON file holding a list of parameter sets")
+    parser.add_argument("--out", required=True, help="Output folder (also holds the checkpoint file)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--chunk-workers", dest="chunkWorkers", type=int, default=1,
+                        help="Number of processes each job uses to create chunks of custom sized Dungeons (e.g --workers 1 --chunk-workers 8 for one large Dungeon)")
+    parser.add_argument("--size", default=jobDefaults["size"], help="1 = Tiny, 2 = Small, 3 = Medium, 4 = Large, or custom dimensions e.g 500x500")
+    parser.add_argument("--shape", default=jobDefaults["shape"], choices=["Square", "Rectangle"])
+    parser.add_argument("--corridor", default=jobDefaults["corridor"], choices=["BSP", "Drunkard"])
+    parser.add_argument("--tileset", default=jobDefaults["tileset"])
+    parser.add_argument("--theme", default=jobDefaults["theme"])
+    parser.add_argument("--party-size", dest="partySize", type=int, default=jobDefaults["partySize"], help="0 for a random party size")
+    parser.add_argument("--party-level", dest="partyLevel", type=int, default=jobDefaults["partyLevel"], help="0 for a random party level")
+    parser.add_argument("--density", default=jobDefaults["density"], choices=["scarce", "normal", "dense", "full"])
+    parser.add_argument("--room-sizing", dest="roomSizing", default=jobDefaults["roomSizing"], choices=["batch", "legacy"])
+    parser.add_argument("--corridor-steps", dest="corridorSteps", default=jobDefaults["corridorSteps"], choices=["batch", "legacy"],
+                        help="How Drunkard corridor steps are chosen (legacy gives the same Dungeons as older versions)")
+    parser.add_argument("--pop-seed", dest="popSeed", type=int, default=None, help="Population seed for every job (default: same as Dungeon seed)")
+    parser.add_argument("--progress", type=int, default=10, help="Number of finished jobs between progress messages")
+    return parser.parse_args(argv)
+
+#Method to run a batch from command line arguments
+#In -> List of arguments
+#Out -> Exit code (0 if every job finished)
+def runBatch(argv):
+    args = parseArguments(argv)
+    try:
+        jobs = buildJobs(args)
+    except (OSError, ValueError) as e:
+        log("Error: {0}".format(e), ERROR)
+        return 2
+    failed = runJobs(jobs, args.out, max(1, args.workers), max(1, args.progress), max(1, args.chunkWorkers))
+    if failed > 0:
+        log("{0} jobs failed -> Run again to retry them".format(failed), ERROR)
+        return 1
+    return 0
@@ -0,0 +1,278 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonCache.py
+#   Description -   Python file to handle caching of generated Dungeons.
+#                   Dungeons are stored by a key made from the parameters that decide their layout (Size, Shape, CorridorAlgorithm, Seed, Tileset, RoomSizing, CorridorSteps),
+#                   so a Dungeon requested again with the same seed is not regenerated.
+#                   There are two levels of cache - an in-memory LRU cache limited by size in bytes, and a disk cache limited by total file size.
+#
+#   Changelog   -   18/10/26    -   Created two-level Dungeon cache
+#                               -   Room sizing method added to cache key
+#                               -   Cache version increased as Room is now slotted
+#                               -   Drunkards Walk step method added to cache key
+#                               -   Entries without an image (very large Dungeons) can now be stored
+#                               -   Added CachedImage so encoded images (map tiles) can be kept in a MemoryCache
+#                               -   Corridors are now kept with cached Dungeons (cache version increased)
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from dungeonTracing import log, ERROR
+
+#Version of stored entries -> Changing this stops old entries from being used
+cacheVersion = 5
+
+#Default cache limits
+defaultMemoryBytes = 64 * 1024 * 1024
+defaultDiskBytes = 512 * 1024 * 1024
+defaultCacheFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+#Method to create the cache key for a Dungeon
+#In -> Size, Shape, CorridorAlgorithm, Dungeon Seed, Tileset, Room sizing method, Drunkards Walk step method
+#Out -> Key (hex string)
+def cacheKey(Size, Shape, CorridorAlgorithm, DunSeed, Tileset, RoomSizing = "batch", CorridorSteps = "batch"):
+    canonical = repr((cacheVersion, str(Size), str(Shape), str(CorridorAlgorithm), int(DunSeed), str(Tileset), str(RoomSizing), str(CorridorSteps)))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+#CachedDungeon class
+#Holds the parts of a generated Dungeon needed to show and populate it again
+class CachedDungeon:
+    grid = None
+    rooms = None
+    corridors = None
+    image = None
+
+    #Constructor
+    #In -> Grid (2D array), List of rooms, List of corridors, Image (PNG bytes, None if Dungeon is too large or was not drawn)
+    def __init__(self, Grid, Rooms, Corridors, Image):
+        self.grid = Grid
+        self.rooms = Rooms
+        self.corridors = Corridors
+        self.image = Image
+
+    #Getter methods
+    def getGrid(self):
+        return self.grid
+
+    def getRooms(self):
+        return self.rooms
+
+    def getCorridors(self):
+        return self.corridors
+
+    def getImage(self):
+        return self.image
+
+    #Method to estimate memory used by this entry
+    #In -> None
+    #Out -> Size in bytes
+    def getSize(self):
+        imageSize = 0 if self.image == None else len(self.image)
+        return self.grid.nbytes + imageSize + ((len(self.rooms) + len(self.corridors)) * 64)
+
+#CachedImage class
+#Holds an encoded image (e.g a map tile) so it can be kept in a MemoryCache
+class CachedImage:
+    image = None
+
+    #Constructor
+    #In -> Image (encoded bytes)
+    def __init__(self, Image):
+        self.image = Image
+
+    def getImage(self):
+        return self.image
+
+    def getSize(self):
+        return len(self.image)
+
+#MemoryCache class
+#Least recently used cache, limited by total size of entries
+class MemoryCache:
+    maxBytes = None
+    currentBytes = None
+    entries = None
+    lock = None
+
+    #Constructor
+    #In -> Maximum size in bytes
+    def __init__(self, MaxBytes):
+        self.maxBytes = MaxBytes
+        self.currentBytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    #Method to get an entry, marking it as most recently used
+    #In -> Key
+    #Out -> CachedDungeon (None if not found)
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry != None:
+                self.entries.move_to_end(key)
+            return entry
+
+    #Method to add an entry, removing least recently used entries until it fits
+    #In -> Key, CachedDungeon
+    #Out -> None
+    def put(self, key, entry):
+        size = entry.getSize()
+        if size > self.maxBytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.currentBytes -= self.entries.pop(key).getSize()
+            self.entries[key] = entry
+            self.currentBytes += size
+            while self.currentBytes > self.maxBytes:
+                oldKey, oldEntry = self.entries.popitem(last=False)
+                self.currentBytes -= oldEntry.getSize()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.currentBytes = 0
+
+#DiskCache class
+#Stores entries as files in a folder, removing least recently used files when total size is too large
+#Total size of files is counted as entries are written, so the folder is only scanned when the cache may be over its limit
+class DiskCache:
+    folder = None
+    maxBytes = None
+    currentBytes = None
+    lock = None
+
+    #Constructor
+    #In -> Cache folder, Maximum size in bytes
+    def __init__(self, Folder, MaxBytes):
+        self.folder = Folder
+        self.maxBytes = MaxBytes
+        #Not known until the folder is first scanned
+        self.currentBytes = None
+        self.lock = threading.Lock()
+
+    def getPath(self, key):
+        return os.path.join(self.folder, key + ".pickle")
+
+    #Method to get an entry from disk
+    #In -> Key
+    #Out -> CachedDungeon (None if not found or unreadable)
+    def get(self, key):
+        path = self.getPath(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            #Update access time so entry is kept over older ones
+            os.utime(path)
+            return entry
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    #Method to write an entry to disk, then remove old entries if over the size limit
+    #In -> Key, CachedDungeon
+    #Out -> None
+    def put(self, key, entry):
+        if self.maxBytes <= 0:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            path = self.getPath(key)
+            #Write to temporary file first so a partly written entry is never read
+            #(Temporary name is unique across processes, as other processes may be writing the same entry)
+            handle, temp = tempfile.mkstemp(suffix=".tmp", dir=self.folder)
+            try:
+                with os.fdopen(handle, "wb") as f:
+                    pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+                    size = f.tell()
+                try:
+                    oldSize = os.stat(path).st_size
+                except OSError:
+                    oldSize = 0
+                os.replace(temp, path)
+            finally:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            with self.lock:
+                if self.currentBytes != None:
+                    self.currentBytes += size - oldSize
+                full = self.currentBytes == None or self.currentBytes > self.maxBytes
+            if full:
+                self.evict()
+        except OSError as e:
+            log("Unable to write dungeon cache: {0}".format(e), ERROR)
+
+    #Method to remove least recently used files until cache is under its size limit
+    #In -> None
+    #Out -> None
+    def evict(self):
+        with self.lock:
+            files = []
+            total = 0
+            for name in os.listdir(self.folder):
+                if not name.endswith(".pickle"):
+                    continue
+                path = os.path.join(self.folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            files.sort()
+            for modified, size, path in files:
+                if total <= self.maxBytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+            self.currentBytes = total
+
+    def clear(self):
+        with self.lock:
+            if os.path.isdir(self.folder):
+                for name in os.listdir(self.folder):
+                    if name.endswith(".pickle"):
+                        os.remove(os.path.join(self.folder, name))
+            self.currentBytes = 0
+
+#DungeonCache class
+#Checks the memory cache first, then the disk cache (moving disk entries into memory when found)
+class DungeonCache:
+    memory = None
+    disk = None
+
+    #Constructor
+    #In -> Memory cache size in bytes, Disk cache folder, Disk cache size in bytes
+    def __init__(self, MemoryBytes = defaultMemoryBytes, Folder = defaultCacheFolder, DiskBytes = defaultDiskBytes):
+        self.memory = MemoryCache(MemoryBytes)
+        self.disk = DiskCache(Folder, DiskBytes)
+
+    #Method to get a cached Dungeon
+    #In -> Key
+    #Out -> CachedDungeon (None if not cached)
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry == None:
+            entry = self.disk.get(key)
+            if entry != None:
+                self.memory.put(key, entry)
+        return entry
+
+    #Method to add a Dungeon to the caches
+    #In -> Key, CachedDungeon, Whether to also write it to disk (e.g not for random seeds, which are unlikely to be asked for again)
+    #Out -> None
+    def put(self, key, entry, disk = True):
+        self.memory.put(key, entry)
+        if disk:
+            self.disk.put(key, entry)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+#Cache shared by every request
+dungeonCache = DungeonCache()
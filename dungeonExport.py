@@ -0,0 +1,87 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonExport.py
+#   Description -   Python file to handle converting a generated Dungeon to plain data (for JSON), so other tools can read its layout
+#                   without reading the image.
+#                   The grid is sent either run-length encoded (a flat list of value, count pairs) or as base64 uint8 bytes,
+#                   in both cases in grid order (grid[x][y], x first) with the grid width and height given alongside.
+#
+#   Changelog   -   18/10/26    -   Created Dungeon export for JSON API
+
+import base64
+from dungeonImports import LazyModule
+
+#Heavy libraries are only imported when first used
+np = LazyModule("numpy")
+
+#Grid encodings
+gridEncodings = ["rle", "base64"]
+
+#Method to run-length encode a grid
+#In -> Grid (2D array)
+#Out -> List of value, count pairs (flattened, e.g [0, 150, 5, 12, ...])
+def runLengthEncode(grid):
+    flat = np.asarray(grid).ravel()
+    if flat.size == 0:
+        return []
+    #Start of each run -> First cell, and every cell with a different value to the one before
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    counts = np.diff(np.append(starts, flat.size))
+    return np.column_stack((flat[starts], counts)).ravel().tolist()
+
+#Method to encode a grid
+#In -> Grid (2D array), Encoding ("rle" or "base64")
+#Out -> Dictionary of grid data
+def gridData(grid, encoding):
+    grid = np.asarray(grid, dtype=np.uint8)
+    data = {"width": int(grid.shape[0]), "height": int(grid.shape[1]), "encoding": encoding}
+    if encoding == "rle":
+        data["data"] = runLengthEncode(grid)
+    elif encoding == "base64":
+        data["data"] = base64.b64encode(np.ascontiguousarray(grid).tobytes()).decode("ascii")
+    else:
+        raise ValueError("Unknown grid encoding {0}".format(encoding))
+    return data
+
+#Method to get the position and dimensions of a rectangle (room or corridor)
+#Values may be NumPy integers, so are converted for JSON
+#In -> Room or Corridor
+#Out -> Dictionary of x, y, width, height
+def rectangleData(rectangle):
+    return {"x": int(rectangle.getX()), "y": int(rectangle.getY()), "width": int(rectangle.getWidth()), "height": int(rectangle.getHeight())}
+
+#Method to get data for a room
+#In -> Room number, Room
+#Out -> Dictionary of room data (merged rooms also list the rooms they are made from)
+def roomData(number, room):
+    data = rectangleData(room)
+    data["number"] = number
+    data["size"] = int(room.getSize())
+    if hasattr(room, "getMembers"):
+        data["parts"] = [rectangleData(part) for part in room.getMembers()]
+    return data
+
+#Method to get data for a corridor
+#In -> Corridor (rectangle) or CorridorPath (Drunkard's Walk)
+#Out -> Dictionary of corridor data
+def corridorData(corridor):
+    if hasattr(corridor, "getPathX"):
+        return {"path": np.column_stack((corridor.getPathX(), corridor.getPathY())).tolist()}
+    return rectangleData(corridor)
+
+#Method to get data for an encounter
+#In -> Encounter
+#Out -> Dictionary of encounter data
+def encounterData(encounter):
+    return {"room": encounter.getRoom(), "enemy": encounter.getEnemy(), "number": encounter.getNumber(), "xp": encounter.getXP()}
+
+#Method to get data for a whole Dungeon
+#In -> CachedDungeon, List of encounters, Grid encoding ("rle" or "base64")
+#Out -> Dictionary of grid, rooms, corridors and encounters
+def dungeonData(dungeon, encounters, encoding = "rle"):
+    rooms = dungeon.getRooms()
+    return {
+        "grid": gridData(dungeon.getGrid(), encoding),
+        "rooms": [roomData(i + 1, rooms[i]) for i in range(0, len(rooms))],
+        "corridors": [corridorData(corridor) for corridor in dungeon.getCorridors()],
+        "encounters": [encounterData(encounter) for encounter in encounters],
+    }
@@ -24,54 +24,227 @@
 #                   25/02/21    -   Room size now dependant on overall size of Dungeon (scalable)
 #                   17/03/21    -   Dungeon Image can now display different Tilesets
 #                   25/03/21    -   Room sizes are now determined via a Gaussian Normal Distribution
+#                   18/10/26    -   Tileset sprites and font are now loaded once and cached (dungeonTilesets.py)
+#                               -   Dungeon Image is now drawn in a single step from the tileset atlas (dungeonRendering.py)
+#                               -   Dungeon Image is now returned as PNG bytes instead of being saved to static folder
+#                               -   Generated Dungeons are now cached by their parameters (dungeonCache.py)
+#                               -   Overlapping and touching rooms are now found with sweep and prune instead of checking every pair
+#                               -   Overlapping rooms are now merged into composite rooms using union-find
+#                               -   Each phase of generation is now timed (dungeonTracing.py) and console messages have log levels
+#                               -   Room sizes are now sampled for every leaf at once (legacy per-leaf sampling kept as an option)
+#                               -   NumPy and SciPy are now imported on first use, and the corridor lookup table is built on first use
+#                               -   BSP leaves are now held in an array-backed LeafTree, split from a queue and traversed without recursion
+#                               -   Room, Corridor and Leaf are now slotted, and leaves share one DungeonConfig
+#                               -   Drunkards Walk corridors are now stored as one CorridorPath of tile co-ordinates, and placed in the grid in one step
+#                               -   Drunkards Walk steps are now shuffled as one array (legacy per-step sampling kept as an option)
+#                               -   Rectangular corridors are now placed in the grid from a difference array instead of tile by tile
+#                               -   Each request now uses its own random generators instead of seeding the global random and np.random
+#                               -   Dungeons can now be created in bulk from the command line (dungeonBatch.py)
+#                               -   Dungeons can now be any size (e.g "500x500") -> Created as chunks in parallel, then joined with corridors
+#                               -   Main split into getDungeon and populateRooms so the server can keep the grid and rooms of each Dungeon
+#                               -   Dungeon image can now be skipped (e.g for the JSON API), and corridors are kept with cached Dungeons
 
 
 
+import os
 import random
+import re
 import sys
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dungeonImports import LazyModule
 from dungeonPopulation import populateDungeon
-from scipy.stats import truncnorm
+from dungeonRendering import renderImage, encodePNG
+from dungeonCache import dungeonCache, cacheKey, CachedDungeon
+from dungeonTracing import PhaseTracer, log, ERROR, INFO, DEBUG
 
+#Heavy libraries are only imported when first used
+np = LazyModule("numpy")
+scipyStats = LazyModule("scipy.stats")
+#scipy.special is much quicker to import than scipy.stats, so batch room sizing does not pay for scipy.stats
+scipySpecial = LazyModule("scipy.special")
 
 
+
+#Method to choose a corridor tile from the tiles surrounding it
+#In -> Booleans for corridor/room to the left, right, above and below, and corridor on each diagonal
+#Out -> Corridor tile value (25 if no tile matches)
+def chooseCorridorTile(corridorLeft, corridorRight, corridorUp, corridorDown, roomLeft, roomRight, roomUp, roomDown, diagonalTL, diagonalTR, diagonalBL, diagonalBR):
+    #Double wide corridors
+    #Vertical Right
+    if (corridorUp or roomUp) and (corridorDown or roomDown) and (corridorLeft or roomLeft) and (diagonalBL or diagonalTL):
+        return 13
+    #vertical left
+    elif (corridorUp or roomUp) and (corridorDown or roomDown) and (corridorRight or roomRight) and (diagonalBR or diagonalTR):
+        return 12
+    #Horizontal Top
+    elif (corridorRight or roomRight) and (corridorLeft or roomLeft) and (corridorDown or roomDown) and (diagonalBL or diagonalBR):
+        return 14
+    elif (corridorRight or roomRight) and (corridorLeft or roomLeft) and (corridorUp or roomUp) and (diagonalTL or diagonalTR):
+        return 15
+    
+    #Corridor on all sides
+    elif corridorLeft and corridorRight and corridorDown and corridorUp:
+        #Crossroads - Corridor on all sides
+        return 20
+    #Don't need Room on all sides as this would be inside a room and not a corridor tile
+
+    #Corridor on 3 sides with room on the other
+    elif corridorLeft and corridorRight and corridorDown and roomUp:
+        #Crossroads bordering on room above
+        return 20
+    elif corridorLeft and corridorRight and roomDown and corridorUp:
+        #Crossroads bordering on room below
+        return 20
+    elif roomLeft and corridorRight and corridorDown and corridorUp:
+        #Crossroads bordering on room left
+        return 20
+    elif corridorLeft and roomRight and corridorDown and corridorUp:
+        #Crossroads bordering on room right
+        return 20
+    
+    #Corridor on 3 sides with nothing on other
+    elif corridorLeft and corridorRight and corridorUp and not corridorDown:
+        #Not Down
+        return 24
+    elif corridorLeft and corridorRight and not corridorUp and corridorDown:
+        #Not Up
+        return 23
+    elif corridorLeft and not corridorRight and corridorUp and corridorDown:
+        #Not right
+        return 22
+    elif not corridorLeft and corridorRight and corridorUp and corridorDown:
+        #Not Left
+        return 21
+
+
+    #Corridor on just two sides
+    elif corridorLeft and corridorUp:
+        #TopLeft
+        return 16
+    elif corridorLeft and corridorDown:
+        #BottomLeft
+        return 18
+    elif corridorRight and corridorUp:
+        #TopRight
+        return 17
+    elif corridorRight and corridorDown:
+        #BottomRight
+        return 19
+    elif corridorRight and corridorLeft:
+        #Horizontal
+        return 11
+    elif corridorUp and corridorDown:
+        #Vertical
+        return 10
+
+    #Corridor on one side and room on one side
+    elif roomUp and corridorDown:
+        #Vertical
+        return 10
+    elif roomDown and corridorUp:
+        #Vertical
+        return 10
+    elif roomLeft and corridorRight:
+        #Horizontal
+        return 11
+    elif roomRight and corridorLeft:
+        #Horizontal
+        return 11
+
+    elif (roomUp or corridorUp) and (roomRight or corridorRight):
+        #Top right Corner tile
+        return 17
+    elif (roomUp or corridorUp) and (roomLeft or corridorLeft):
+        #Top left corner tile
+        return 16
+    elif (roomDown or corridorDown) and (roomRight or corridorRight):
+        #Bottom Right corner tile
+        return 19
+    elif (roomDown or corridorDown) and (roomLeft or corridorLeft):
+        #Bottom left corner tile
+        return 18
+
+    elif roomLeft and roomRight:
+        #Horizontal tile
+        return 11
+    elif roomUp and roomDown:
+        #Vertical tile
+        return 10
+    
+    #No matching tile -> Leave as undefined
+    return 25
+
+#Method to build the corridor autotile lookup table
+#Each undefined corridor tile is given a key describing its neighbours:
+#Bits 0-7  -> Corridor to the Left, Right, Up, Down, TopLeft, TopRight, BottomLeft, BottomRight
+#Bits 8-11 -> Room to the Left, Right, Up, Down
+#Room and corridor neighbours are kept apart as the tile chosen differs between them (e.g crossroads)
+#In -> None
+#Out -> Array mapping each of the 4096 keys to a corridor tile
+def buildCorridorTable():
+    table = np.zeros(1 << 12, dtype=np.uint8)
+    for key in range(0, len(table)):
+        bits = [(key >> bit) & 1 == 1 for bit in range(0, 12)]
+        table[key] = chooseCorridorTile(bits[0], bits[1], bits[2], bits[3], bits[8], bits[9], bits[10], bits[11], bits[4], bits[5], bits[6], bits[7])
+    return table
+
+#Lookup table for corridor tiles -> Built once on first use
+corridorTileTable = None
+
+#Method to get the corridor autotile lookup table, building it if needed
+#In -> None
+#Out -> Array mapping each of the 4096 keys to a corridor tile
+def getCorridorTileTable():
+    global corridorTileTable
+    if corridorTileTable is None:
+        corridorTileTable = buildCorridorTable()
+    return corridorTileTable
+
+#Method to sample from truncated normal distributions in one step
+#Uses the inverse CDF of the normal distribution on an array of uniform samples
+#In -> Array of means, Standard deviation, Array of lower bounds, Array of upper bounds, Array of uniform samples in [0, 1)
+#Out -> Array of samples
+def sampleTruncatedNormal(means, sd, lows, upps, uniforms):
+    lowCdf = scipySpecial.ndtr((lows - means) / sd)
+    uppCdf = scipySpecial.ndtr((upps - means) / sd)
+    samples = means + sd * scipySpecial.ndtri(lowCdf + uniforms * (uppCdf - lowCdf))
+    #Guard against rounding at the very ends of the distribution
+    return np.clip(samples, lows, upps)
+
 #Grid class
 #Used to make 2D grid for Dungeon map
+#Grid is stored as a NumPy array padded with a border of empty (0) tiles, so neighbour checks never wrap around the edges
 class Grid:
     grid = None
+    cells = None
     width = None
     height = None
     
     #Constructor
-    #In -> Width, Height, list of rooms in Dungeon, list of corridors in Dungeon, list of child rooms
-    def __init__(self, Width, Height, roomList, corridorList, childRooms):
-        #Create grid
-        self.grid = []
+    #In -> Width, Height, list of rooms in Dungeon, list of corridors in Dungeon
+    def __init__(self, Width, Height, roomList, corridorList):
         self.width = Width
         self.height = Height
-        #Populate with 0 in each cell
-        for i in range(0, self.width):
-            new = []
-            for i in range(0, self.height):
-                new.append(0)
-            self.grid.append(new)
+        #Create padded grid with 0 in each cell
+        self.cells = np.zeros((self.width + 2, self.height + 2), dtype=np.uint8)
+        #Unpadded view of the grid, indexed as grid[x][y]
+        self.grid = self.cells[1:-1, 1:-1]
         #Now place Rooms into grid
-        self.placeRooms(roomList, childRooms)
+        self.placeRooms(roomList)
         #Now place Corridors into grid
         self.placeCorridors(corridorList)
         #Print grid to console for Debugging
-        #for row in self.grid:
-            #print(row)
+        #print(self.grid)
     
     #Getter method
     def getGrid(self):
         return self.grid
     
     #Method to place dungeon rooms into 2D grid
-    #In -> List of rooms, List of child rooms
+    #In -> List of rooms
     #Out -> None
-    def placeRooms(self, roomList, childRooms):
+    def placeRooms(self, roomList):
         #Put each bottom-level leaf into grid
         #0 = Empty
         #1 = Normal         (Room tiles on each side)
@@ -84,69 +257,54 @@ class Grid:
         #8 = BottomLeft     (Bottom left walls)
         #9 = BottomRight    (Bottom right walls)
         
-        #First put 1 where each tile is to indicate that a room tile is there
+        #First put 1 where each tile is to indicate that a room tile is there (merged rooms use their footprint)
         for room in roomList:
-            for i in range(room.getX(), room.getX() + room.getWidth()):
-                for j in range(room.getY(), room.getY() + room.getHeight()):
-                        #print(i, j)
-                        self.grid[i][j] = 1
-                        
-        
-        #Repeat for all child rooms
-        for room in childRooms:
-            for i in range(room.getX(), room.getX() + room.getWidth()):
-                for j in range(room.getY(), room.getY() + room.getHeight()):
-                        self.grid[i][j] = 1                
-                    
+            x, y, footprint = room.getFootprint()
+            self.grid[x:x + footprint.shape[0], y:y + footprint.shape[1]][footprint] = 1
         
         #Now change each tile to correct value based on surroundings
-        for i in range(0, len(self.grid)):
-            row = self.grid[i]
-            for j in range(0, len(row)):
-            
-                #Booleans to decide what tile to place
-                leftEnd = False
-                rightEnd = False
-                topEnd = False
-                bottomEnd = False
-                
-                if self.grid[i][j] == 1:
-                    #Check left
-                    if self.grid[i][j-1] == 0:
-                        #Left blocked
-                        leftEnd = True
-                    #Check Right
-                    if self.grid[i][j+1] == 0:
-                        #Right Blocked
-                        rightEnd = True
-                    #Check Top
-                    if self.grid[i-1][j] == 0:
-                        #Top Blocked
-                        topEnd = True
-                    #Check Bottom
-                    if self.grid[i+1][j] == 0:
-                        #Bottom Blocked
-                        bottomEnd = True
-                        
-                    #Now set value based on booleans
-                    if topEnd and leftEnd:
-                        self.grid[i][j] = 6
-                    elif topEnd and rightEnd:
-                        self.grid[i][j] = 7
-                    elif topEnd:
-                        self.grid[i][j] = 5
-                    elif bottomEnd and leftEnd:
-                        self.grid[i][j] = 8
-                    elif bottomEnd and rightEnd:
-                        self.grid[i][j] = 9
-                    elif bottomEnd:
-                        self.grid[i][j] = 4
-                    elif leftEnd:
-                        self.grid[i][j] = 2
-                    elif rightEnd:
-                        self.grid[i][j] = 3
-                    else:
-                        self.grid[i][j] = 1
+        #Shifted views of the padded grid give the neighbour in each direction for every tile at once
+        roomTile = self.grid == 1
+        leftEnd = self.cells[1:-1, :-2] == 0
+        rightEnd = self.cells[1:-1, 2:] == 0
+        topEnd = self.cells[:-2, 1:-1] == 0
+        bottomEnd = self.cells[2:, 1:-1] == 0
+        
+        #Now set value based on booleans (first matching condition wins)
+        tiles = np.select(
+            [topEnd & leftEnd, topEnd & rightEnd, topEnd, bottomEnd & leftEnd, bottomEnd & rightEnd, bottomEnd, leftEnd, rightEnd],
+            [6, 7, 5, 8, 9, 4, 2, 3],
+            default = 1)
+        self.grid[roomTile] = tiles[roomTile]
+    
+    #Method to find every tile covered by a corridor
+    #Rectangular corridors are marked with a difference array -> +1/-1 at the corners of each rectangle, then a running total along both axes
+    #gives the number of corridors covering each tile, so cost depends on the number of corridors rather than their area
+    #Corridor paths (Drunkards Walk) are marked directly from their tile co-ordinates
+    #In -> List of corridors
+    #Out -> Boolean array (same shape as grid) of tiles covered by a corridor
+    def getCorridorCoverage(self, corridorList):
+        covered = np.zeros(self.grid.shape, dtype=bool)
+        
+        #Rectangles as (N, 4) array of x, y, width, height
+        rectangles = np.array([(corridor.getX(), corridor.getY(), corridor.getWidth(), corridor.getHeight()) for corridor in corridorList if not isinstance(corridor, CorridorPath)], dtype=np.int64).reshape(-1, 4)
+        if len(rectangles) > 0:
+            x1 = rectangles[:, 0]
+            y1 = rectangles[:, 1]
+            x2 = x1 + rectangles[:, 2]
+            y2 = y1 + rectangles[:, 3]
+            difference = np.zeros((self.width + 1, self.height + 1), dtype=np.int32)
+            np.add.at(difference, (x1, y1), 1)
+            np.add.at(difference, (x2, y1), -1)
+            np.add.at(difference, (x1, y2), -1)
+            np.add.at(difference, (x2, y2), 1)
+            covered |= difference.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] > 0
+        
+        #Paths
+        paths = [corridor for corridor in corridorList if isinstance(corridor, CorridorPath)]
+        if paths != []:
+            covered[np.concatenate([path.getPathX() for path in paths]), np.concatenate([path.getPathY() for path in paths])] = True
+        return covered
     
     #Method to place Dungeon Corridors into Grid
     #In -> List of corridors
@@ -171,194 +329,46 @@ class Grid:
         #25 = Undefined
         
         #Put each corridor into grid as undefined corridorTile
-        for corridor in corridorList:
-            #For each x coord in corridor
-            for i in range(corridor.getX(), corridor.getX() + corridor.getWidth()):
-                #For each y coord in corridor
-                for j in range(corridor.getY(), corridor.getY() + corridor.getHeight()):
-                    #print("Corridor tile: {0},{1}".format(i, j))
-                    #Check if current grid tile is not placed
-                    if self.grid[i][j] == 0:
-                        #If not placed then set to an undefined corridor tile
-                        self.grid[i][j] = 25
+        #Only placed where grid tile is not placed, so rooms are kept over corridors
+        covered = self.getCorridorCoverage(corridorList)
+        self.grid[covered & (self.grid == 0)] = 25
         
         #Now adjust corridor tiles based on surroundings
-        for i in range(0, len(self.grid)):
-            row = self.grid[i]
-            for j in range(0, len(row)):
-                #Booleans to decide which corridor tile to place
-                corridorLeft = False
-                corridorRight = False
-                corridorUp = False
-                corridorDown = False
-                roomUp = False
-                roomDown = False
-                roomLeft = False
-                roomRight = False
-                
-                diagonalTR = False
-                diagonalTL = False
-                diagonalBR = False
-                diagonalBL = False
-                
-                #If tile is undefined corridor
-                if self.grid[i][j] == 25:
-                    #If corridor is to the left
-                    if self.grid[i][j-1] != 0 and self.grid[i][j-1] > 9:
-                        corridorLeft = True
-                    #If corridor is to the right
-                    if self.grid[i][j+1] != 0 and self.grid[i][j+1] > 9:
-                        corridorRight = True
-                    #If corridor is above
-                    if self.grid[i-1][j] != 0 and self.grid[i-1][j] > 9:
-                        corridorUp = True
-                    #If corridor is below
-                    if self.grid[i+1][j] != 0 and self.grid[i+1][j] > 9:
-                        corridorDown = True
-                    #If room is to the left
-                    if self.grid[i][j-1] != 0 and self.grid[i][j-1] < 10:
-                        roomLeft = True
-                    #If room is to the right
-                    if self.grid[i][j+1] != 0 and self.grid[i][j+1] < 10:
-                        roomRight = True
-                    #If room is above
-                    if self.grid[i-1][j] != 0 and self.grid[i-1][j] < 10:
-                        roomUp = True
-                    #If room is below
-                    if self.grid[i+1][j] != 0 and self.grid[i+1][j] < 10:
-                        roomDown = True
-                    if self.grid[i-1][j+1] > 9:
-                        diagonalTR = True
-                    if self.grid[i-1][j-1] > 9:
-                        diagonalTL = True
-                    if self.grid[i+1][j+1] > 9:
-                        diagonalBR = True
-                    if self.grid[i+1][j-1] > 9:
-                        diagonalBL = True
-                        
-                    #Now set value based on booleans
-                    
-                    #Double wide corridors
-                    #Vertical Right
-                    if (corridorUp or roomUp) and (corridorDown or roomDown) and (corridorLeft or roomLeft) and (diagonalBL or diagonalTL):
-                        self.grid[i][j] = 13
-                    #vertical left
-                    elif (corridorUp or roomUp) and (corridorDown or roomDown) and (corridorRight or roomRight) and (diagonalBR or diagonalTR):
-                        self.grid[i][j] = 12
-                    #Horizontal Top
-                    elif (corridorRight or roomRight) and (corridorLeft or roomLeft) and (corridorDown or roomDown) and (diagonalBL or diagonalBR):
-                        self.grid[i][j] = 14
-                    elif (corridorRight or roomRight) and (corridorLeft or roomLeft) and (corridorUp or roomUp) and (diagonalTL or diagonalTR):
-                        self.grid[i][j] = 15
-                    
-                    
-                    
-                    
-                    
-                    #Corridor on all sides
-                    elif corridorLeft and corridorRight and corridorDown and corridorUp:
-                        #Crossroads - Corridor on all sides
-                        self.grid[i][j] = 20
-                    #Don't need Room on all sides as this would be inside a room and not a corridor tile
-                    
-                    #Corridor on 3 sides with room on the other
-                    elif corridorLeft and corridorRight and corridorDown and roomUp:
-                        #Crossroads bordering on room above
-                        self.grid[i][j] = 20    
-                    elif corridorLeft and corridorRight and roomDown and corridorUp:
-                        #Crossroads bordering on room below
-                        self.grid[i][j] = 20 
-                    elif roomLeft and corridorRight and corridorDown and corridorUp:
-                        #Crossroads bordering on room left
-                        self.grid[i][j] = 20    
-                    elif corridorLeft and roomRight and corridorDown and corridorUp:
-                        #Crossroads bordering on room right
-                        self.grid[i][j] = 20    
-                    
-                    
-                    
-                    #Corridor on 3 sides with nothing on other    
-                    elif corridorLeft and corridorRight and corridorUp and not corridorDown:
-                        #Not Down
-                        self.grid[i][j] = 24
-                    elif corridorLeft and corridorRight and not corridorUp and corridorDown:
-                        #Not Up
-                        self.grid[i][j] = 23
-                    elif corridorLeft and not corridorRight and corridorUp and corridorDown:
-                        #Not right
-                        self.grid[i][j] = 22
-                    elif not corridorLeft and corridorRight and corridorUp and corridorDown:
-                        #Not Left
-                        self.grid[i][j] = 21
-                        
-                    
-                    #Corridor on just two sides
-                    elif corridorLeft and corridorUp:
-                        #TopLeft
-                        self.grid[i][j] = 16
-                    elif corridorLeft and corridorDown:
-                        #BottomLeft
-                        self.grid[i][j] = 18
-                    elif corridorRight and corridorUp:
-                        #TopRight
-                        self.grid[i][j] = 17
-                    elif corridorRight and corridorDown:
-                        #BottomRight
-                        self.grid[i][j] = 19
-                    elif corridorRight and corridorLeft:
-                        #Horizontal
-                        self.grid[i][j] = 11
-                    elif corridorUp and corridorDown:
-                        #Vertical
-                        self.grid[i][j] = 10
-                        
-                    #Corridor on one side and room on one side
-                    elif roomUp and corridorDown:
-                        #Vertical
-                        self.grid[i][j] = 10
-                    elif roomDown and corridorUp:
-                        #Vertical
-                        self.grid[i][j] = 10
-                    elif roomLeft and corridorRight:
-                        #Horizontal
-                        self.grid[i][j] = 11
-                    elif roomRight and corridorLeft:
-                        #Horizontal
-                        self.grid[i][j] = 11
-                    
-                    elif (roomUp or corridorUp) and (roomRight or corridorRight):
-                        #Top right Corner tile
-                        self.grid[i][j] = 17
-                    elif (roomUp or corridorUp) and (roomLeft or corridorLeft):
-                        #Top left corner tile
-                        self.grid[i][j] = 16
-                    elif (roomDown or corridorDown) and (roomRight or corridorRight):
-                        #Bottom Right corner tile
-                        self.grid[i][j] = 19
-                    elif (roomDown or corridorDown) and (roomLeft or corridorLeft):
-                        #Bottom left corner tile
-                        self.grid[i][j] = 18
-                        
-                    elif roomLeft and roomRight:
-                        #Horizontal tile
-                        self.grid[i][j] = 11
-                    elif roomUp and roomDown:
-                        #Vertical tile
-                        self.grid[i][j] = 10
-                        
-                    else:
-                        print("Error tile at {0},{1}".format(i,j))
-
+        #Shifted views of the padded grid give the neighbour in each direction for every tile at once
+        corridor = self.cells > 9
+        room = (self.cells != 0) & (self.cells < 10)
+        neighbours = [
+            corridor[1:-1, :-2],    #Corridor Left
+            corridor[1:-1, 2:],     #Corridor Right
+            corridor[:-2, 1:-1],    #Corridor Up
+            corridor[2:, 1:-1],     #Corridor Down
+            corridor[:-2, :-2],     #Diagonal TopLeft
+            corridor[:-2, 2:],      #Diagonal TopRight
+            corridor[2:, :-2],      #Diagonal BottomLeft
+            corridor[2:, 2:],       #Diagonal BottomRight
+            room[1:-1, :-2],        #Room Left
+            room[1:-1, 2:],         #Room Right
+            room[:-2, 1:-1],        #Room Up
+            room[2:, 1:-1]          #Room Down
+        ]
+        #Pack neighbours into a key for each tile
+        keys = np.zeros(self.grid.shape, dtype=np.uint16)
+        for bit in range(0, len(neighbours)):
+            keys |= neighbours[bit].astype(np.uint16) << bit
+        
+        #Now set value of each undefined corridor tile from lookup table
+        undefined = self.grid == 25
+        self.grid[undefined] = getCorridorTileTable()[keys[undefined]]
+        
+        #Report any tiles which could not be decided
+        for i, j in np.argwhere(self.grid == 25):
+            log("Error tile at {0},{1}".format(i, j), ERROR)
     
 #Room class
 #Used to contain information for Dungeon rooms
+#Slotted (no per-instance dictionary) as many rooms are created for every Dungeon
 class Room:
-    x = None
-    y = None
-    height = None
-    width = None
-    childRoom = None
-    size = None
+    __slots__ = ("x", "y", "height", "width", "size")
 
     #Constructor
     #In -> Room x co-ordinate, Room y co-ordinate, Room width, Room Height
@@ -382,18 +392,99 @@ class Room:
     def getWidth(self):
         return self.width
     
+    def getSize(self):
+        return self.size
+    
+    #Method to get the tiles covered by this room
+    #In -> None
+    #Out -> Footprint x co-ordinate, Footprint y co-ordinate, Boolean mask of covered tiles
+    def getFootprint(self):
+        return self.x, self.y, np.ones((self.width, self.height), dtype=bool)
+    
     #ToString method for bug fixing in console
     def __str__(self):
         return "Room at: (" + str(self.x) + "," + str(self.y) + ") " + str(self.width) + "x" + str(self.height)
         
         
+#CompositeRoom class
+#Used to hold a group of overlapping rooms which have been merged into one room
+#Position and dimensions are those of the representative (first) room, so the room is labelled in the same place
+#Size is the true number of tiles covered by the merged rooms
+class CompositeRoom(Room):
+    __slots__ = ("members", "footprintX", "footprintY", "footprint")
+    
+    #Constructor
+    #In -> List of rooms to merge (first room is the representative)
+    def __init__(self, Members):
+        representative = Members[0]
+        Room.__init__(self, representative.getX(), representative.getY(), representative.getWidth(), representative.getHeight())
+        self.members = Members
+        #Find bounding box of all rooms
+        self.footprintX = min(room.getX() for room in Members)
+        self.footprintY = min(room.getY() for room in Members)
+        footprintWidth = max(room.getX() + room.getWidth() for room in Members) - self.footprintX
+        footprintHeight = max(room.getY() + room.getHeight() for room in Members) - self.footprintY
+        #Mark tiles covered by each room
+        self.footprint = np.zeros((footprintWidth, footprintHeight), dtype=bool)
+        for room in Members:
+            x = room.getX() - self.footprintX
+            y = room.getY() - self.footprintY
+            self.footprint[x:x + room.getWidth(), y:y + room.getHeight()] = True
+        self.size = int(self.footprint.sum())
+    
+    #Getter methods
+    def getMembers(self):
+        return self.members
+    
+    def getRepresentative(self):
+        return self.members[0]
+    
+    def getFootprint(self):
+        return self.footprintX, self.footprintY, self.footprint
+    
+    #ToString method
+    def __str__(self):
+        return "Composite Room at: (" + str(self.x) + "," + str(self.y) + ") of " + str(len(self.members)) + " rooms, " + str(self.size) + " tiles"
+        
+        
+#DisjointSet class
+#Union-find structure used to group overlapping rooms
+#The lowest index in each group is always its root, so each group has a stable representative
+class DisjointSet:
+    parent = None
+    
+    #Constructor
+    #In -> Number of items
+    def __init__(self, Size):
+        self.parent = list(range(0, Size))
+    
+    #Method to find the root of an item's group
+    #In -> Item index
+    #Out -> Root index
+    def find(self, item):
+        while self.parent[item] != item:
+            #Path halving -> Point item at its grandparent as we go
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+    
+    #Method to join the groups of two items
+    #In -> Item index, Item index
+    #Out -> None
+    def union(self, item1, item2):
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 < root2:
+            self.parent[root2] = root1
+        elif root2 < root1:
+            self.parent[root1] = root2
+        
+        
 #Corridor class
 #Used to contain information about Dungeon Corridors
+#Slotted (no per-instance dictionary) as many corridors are created for every Dungeon
 class Corridor:
-    x = None
-    y = None
-    height = None
-    width = None
+    __slots__ = ("x", "y", "height", "width")
     
     #Constructor
     #In -> Corridor x co-ordinate, Corridor y co-ordinate, Corridor width, Corridor height
@@ -419,51 +510,111 @@ class Corridor:
     #ToString method
     def __str__(self):
         return "Corridor at: (" + str(self.x) + "," + str(self.y) + ") " + str(self.width) + "x" + str(self.height)
-       
-#BSP Leaf Class       
-class Leaf:
-    #Positional variables
-    x = None
-    y = None
-    width = None
-    height = None
-    #Child variables
-    leftChild = None
-    rightChild = None
-    room = None
-    #Size restriction variables
-    minimumSize = None
-    maximumLeafSize = None
+
+#CorridorPath class
+#Used to contain a corridor made of single tiles (Drunkards Walk), stored as arrays of tile co-ordinates
+class CorridorPath:
+    __slots__ = ("pathX", "pathY")
+    
+    #Constructor
+    #In -> Array of x co-ordinates, Array of y co-ordinates (one per tile, in order walked)
+    def __init__(self, PathX, PathY):
+        self.pathX = np.asarray(PathX, dtype=np.int32)
+        self.pathY = np.asarray(PathY, dtype=np.int32)
+    
+    #Getter methods
+    def getPathX(self):
+        return self.pathX
     
-    corridorAlgorithm = None
+    def getPathY(self):
+        return self.pathY
     
-    dungeonWidth = None
-    dungeonHeight = None
+    def getLength(self):
+        return len(self.pathX)
+    
+    #ToString method
+    def __str__(self):
+        return "Corridor path from: (" + str(self.pathX[0]) + "," + str(self.pathY[0]) + ") to (" + str(self.pathX[-1]) + "," + str(self.pathY[-1]) + ") " + str(len(self.pathX)) + " tiles"
+       
+#DungeonConfig class
+#Settings shared by every leaf of a Dungeon (each leaf references the same DungeonConfig)
+#Also holds the random generators used to create the Dungeon, so Dungeons created at the same time (e.g in different threads) do not affect each other
+class DungeonConfig:
+    __slots__ = ("corridorAlgorithm", "corridorSteps", "preset", "dungeonWidth", "dungeonHeight", "minimumSize", "maximumLeafSize", "rng", "numpyRng")
     
     #Constructor
-    #In -> Leaf X co-ordinate, Leaf Y co-ordinate, Leaf width, Leaf height, selected Corridor-placing algorithm, Dungeon Width, Dungeon Height
-    def __init__(self, X, Y, Width, Height, CorridorAlg, DunWidth, DunHeight):
-        self.x = X
-        self.y = Y
-        self.width = Width
-        self.height = Height
+    #In -> selected Corridor-placing algorithm, Size preset ("1"-"4", or "custom" for custom sized Dungeons and their chunks), Dungeon Width, Dungeon Height,
+    #      Python random generator, NumPy random generator, Drunkards Walk step method ("batch" or "legacy")
+    def __init__(self, CorridorAlg, Preset, DunWidth, DunHeight, Rng, NumpyRng, CorridorSteps = "batch"):
+        self.rng = Rng
+        self.numpyRng = NumpyRng
         self.corridorAlgorithm = CorridorAlg
+        self.corridorSteps = CorridorSteps
+        self.preset = Preset
         self.dungeonWidth = DunWidth
         self.dungeonHeight = DunHeight
         #Set minimum leaf size based on Size of Dungeon
         self.minimumSize = 6    #Always have minimum size of 4x4
-        if DunWidth == 25:
+        if Preset == "1":
             self.maximumLeafSize = 12 #Allows 10x10 rooms
-        elif DunWidth == 51:
+        elif Preset == "3":
             self.maximumLeafSize = 18 #Allows 16x16 rooms
-        elif DunWidth == 70:
+        elif Preset == "4":
             self.maximumLeafSize = 22 #Allows for 20x20 rooms
-        else:                         #Default
+        elif Preset == "2":
             self.maximumLeafSize = 16 #Allows for 14x14 rooms
-  
-        
-    def __str__(self):
-        return "{0},{1} {2}x{3}".format(self.x, self.y, self.width, self.height)
+        else:                         #Custom size (e.g chunk of a large Dungeon) -> Same as Large
+            self.maximumLeafSize = 22 #Allows for 20x20 rooms
+    
+    #Getter methods
+    def getCorridorAlgorithm(self):
+        return self.corridorAlgorithm
+    
+    def getCorridorSteps(self):
+        return self.corridorSteps
+    
+    def getPreset(self):
+        return self.preset
+    
+    def getDungeonWidth(self):
+        return self.dungeonWidth
+    
+    def getDungeonHeight(self):
+        return self.dungeonHeight
+    
+    def getMinimumSize(self):
+        return self.minimumSize
+    
+    def getMaximumLeafSize(self):
+        return self.maximumLeafSize
+    
+    def getRandom(self):
+        return self.rng
+    
+    def getNumpyRandom(self):
+        return self.numpyRng
+       
+#BSP Leaf Class
+#Slotted (no per-instance dictionary), with settings shared by every leaf held in one DungeonConfig
+class Leaf:
+    __slots__ = ("x", "y", "width", "height", "leftChild", "rightChild", "room", "roomWidth", "roomHeight", "config")
+    
+    #Constructor
+    #In -> Leaf X co-ordinate, Leaf Y co-ordinate, Leaf width, Leaf height, DungeonConfig
+    def __init__(self, X, Y, Width, Height, Config):
+        #Positional variables
+        self.x = X
+        self.y = Y
+        self.width = Width
+        self.height = Height
+        #Child variables
+        self.leftChild = None
+        self.rightChild = None
+        self.room = None
+        self.roomWidth = None
+        self.roomHeight = None
+        #Settings shared by every leaf (size restrictions, corridor algorithm, dungeon size)
+        self.config = Config
     
     #Getter methods
     def getX(self):
@@ -485,47 +636,17 @@ class Leaf:
         return self.rightChild
         
     def getMinimumSize(self):
-        return self.minimumSize
+        return self.config.minimumSize
         
     def getMaximumLeafSize(self):
-        return self.maximumLeafSize
+        return self.config.maximumLeafSize
+    
+    def getConfig(self):
+        return self.config
     
-    #Method to get a room from a leaf
-    #Doesn't work the same as other getters, as this leaf might not have a room
-    #So child leaves are also checked to see if they have a room
-    #In -> None
-    #Out -> Child Room
     def getRoom(self):
-        #If leaf has a room -> return it
-        if self.room != None:
-            return self.room
-        #Otherwise find a room below
-        else:
-            leftRoom = None
-            rightRoom = None
-            #Check if left child exists
-            if self.leftChild != None:
-                #Find room from left side
-                leftRoom = self.leftChild.getRoom()
-            #Check if right child exists
-            if self.rightChild != None:
-                rightRoom = self.rightChild.getRoom()
-            
-            #Check if both rooms are null
-            if leftRoom == None and rightRoom == None:
-                return None
-            elif rightRoom == None:
-                return leftRoom
-            elif leftRoom == None:
-                return rightRoom
-            #50 percent chance to return left or right from here
-            rand = random.randint(0,1)
-            if rand == 0:
-                return leftRoom
-            else:
-                return rightRoom
-                
-        
+        return self.room
+    
     #ToString method
     def __str__(self):
         return "Leaf at: (" + str(self.x) + "," + str(self.y) + ") " + str(self.width) + "x" + str(self.height)
@@ -543,51 +664,51 @@ class Leaf:
             #Otherwise split randomly
             splitDirection = None
             #If the leaf can be split either way -> Follow split algorithm
-            if self.height > self.maximumLeafSize and self.width > self.maximumLeafSize:
+            if self.height > self.config.maximumLeafSize and self.width > self.config.maximumLeafSize:
                 if self.height > self.width and (self.height / self.width) >= 1.25:
                     splitDirection = 1 #Horizontal
                 elif self.width > self.height and (self.width / self.height) >= 1.25:
                     splitDirection = 2 #Vertical
                 else:
-                    splitDirection = random.randint(1,2) #Random direction
+                    splitDirection = self.config.rng.randint(1,2) #Random direction
             else:
                 #Otherwise split the only way it can be
-                if self.height > self.maximumLeafSize:
+                if self.height > self.config.maximumLeafSize:
                     splitDirection = 1 #Horizontal
-                elif self.width > self.maximumLeafSize:
+                elif self.width > self.config.maximumLeafSize:
                     splitDirection = 2 #Vertical
                 else:
                     #If room doesn't NEED to be split, randomly decide whether to split anyway if possible
                     #This is based on the size of the dungeon
-                    if self.maximumLeafSize == 12:
-                        temp = random.randint(1,2)
+                    if self.config.preset == "1":
+                        temp = self.config.rng.randint(1,2)
                         if temp == 1:
                             #Dont split
                             return false
-                    elif self.maximumLeafSize == 16:
-                        temp = random.randint(1,3)
+                    elif self.config.preset == "2":
+                        temp = self.config.rng.randint(1,3)
                         if temp == 1:
                             #Dont split
                             return false
-                    elif self.maximumLeafSize == 18:
-                        temp = random.randint(1,4)
+                    elif self.config.preset == "3":
+                        temp = self.config.rng.randint(1,4)
                         if temp == 1:
                                #Dont split
                                return false
                     else:
-                        temp = random.randint(1,5)
+                        temp = self.config.rng.randint(1,5)
                         if temp == 1:
                             #Don't split
                             return false
                         
                     #Now decide how to split
                     
-                    if self.height > (self.minimumSize * 2) and self.width > (self.minimumSize * 2):
+                    if self.height > (self.config.minimumSize * 2) and self.width > (self.config.minimumSize * 2):
                         #Split randomly
-                        splitDirection = random.randint(1,2)
-                    elif self.height > (self.minimumSize * 2):
+                        splitDirection = self.config.rng.randint(1,2)
+                    elif self.height > (self.config.minimumSize * 2):
                         splitDirection = 1
-                    elif self.width > (self.minimumSize * 2):
+                    elif self.width > (self.config.minimumSize * 2):
                         splitDirection = 2
                     else:
                         #Otherwise dont split
@@ -597,29 +718,29 @@ class Leaf:
             #Eg: Cant split 15 into 5 and 10 as 5 is less than minimum leaf size
             maxSplit = None
             if splitDirection == 1:
-                maxSplit = self.height - self.minimumSize
+                maxSplit = self.height - self.config.minimumSize
             else:
-                maxSplit = self.width - self.minimumSize
+                maxSplit = self.width - self.config.minimumSize
             #print(maxSplit)
             #Determine where to split current leaf
             splitPoint = None
-            if maxSplit == self.minimumSize:
-                splitPoint = self.minimumSize
-            elif maxSplit < self.minimumSize:
+            if maxSplit == self.config.minimumSize:
+                splitPoint = self.config.minimumSize
+            elif maxSplit < self.config.minimumSize:
                 return False
             else:
-                splitPoint = random.randint(self.minimumSize, maxSplit)
+                splitPoint = self.config.rng.randint(self.config.minimumSize, maxSplit)
             #print("Split Point: " + str(splitPoint))
             #Create children based on split point
             if splitDirection == 1:
                 #Split horizontally
-                self.leftChild = Leaf(self.x, self.y, self.width, splitPoint, self.corridorAlgorithm, self.dungeonWidth, self.dungeonHeight)
-                self.rightChild = Leaf(self.x, self.y + splitPoint, self.width, self.height - splitPoint, self.corridorAlgorithm, self.dungeonWidth, self.dungeonHeight)
+                self.leftChild = Leaf(self.x, self.y, self.width, splitPoint, self.config)
+                self.rightChild = Leaf(self.x, self.y + splitPoint, self.width, self.height - splitPoint, self.config)
                 
             else:
                 #Split Vertically
-                self.leftChild = Leaf(self.x, self.y, splitPoint, self.height, self.corridorAlgorithm, self.dungeonWidth, self.dungeonHeight)
-                self.rightChild = Leaf(self.x + splitPoint, self.y, self.width - splitPoint, self.height, self.corridorAlgorithm, self.dungeonWidth, self.dungeonHeight)
+                self.leftChild = Leaf(self.x, self.y, splitPoint, self.height, self.config)
+                self.rightChild = Leaf(self.x + splitPoint, self.y, self.width - splitPoint, self.height, self.config)
             #print(self.leftChild)
             #print(self.rightChild)
             #Return complete
@@ -629,241 +750,518 @@ class Leaf:
             #If both children aren't null then don't split further
             return False
         
-    #Service method to create a normal distribution for the chosen room size
-    def create_truncated_normal(self, mean, sd, low, upp):
-        return truncnorm(
-            (low-mean) / sd, (upp - mean) / sd, loc = mean, scale = sd)
+    #Method to get the range of room sizes that fit in this leaf
+    #In -> None
+    #Out -> Mean width, Mean height, Lower bound, Upper bound for width, Upper bound for height
+    def getRoomBounds(self):
+        #Middle value in range
+        meanWidth = round(((self.width - 2) + (self.config.minimumSize - 2)) / 2)
+        meanHeight = round(((self.height - 2) + (self.config.minimumSize - 2)) / 2)
+        upperBoundWidth = self.width - 2
+        upperBoundHeight = self.height - 2
         
-    #Method to iterate through this leaf and child leaves, and create rooms for each bottom-level child leaf
-    #In -> List of corridors, list of Rooms
-    #Out-> None (Adds rooms to list)
-    def createRooms(self,corridorList, roomList):
-        #Check leaf to see if it has already been split
-        if self.leftChild != None or self.rightChild != None:
-            #Check left child
-            if self.leftChild != None:
-                self.leftChild.createRooms(corridorList, roomList)
-            #Check right child
-            if self.rightChild != None:
-                self.rightChild.createRooms(corridorList, roomList)
-                
-            #If left and right children -> connect them with corridor
-            if self.leftChild != None and self.rightChild != None:
-                #Call Corridor method from Dungeon Class
-                self.createCorridor(self.leftChild.getRoom(), self.rightChild.getRoom(), corridorList)
+        lowerBound = self.config.minimumSize - 2
+        return meanWidth, meanHeight, lowerBound, upperBoundWidth, upperBoundHeight
+    
+    #Method to choose the room size for this leaf using a scipy truncated normal distribution for each dimension
+    #Matches the room sizes of dungeons generated before room sizes were sampled in a batch
+    #In -> None
+    #Out -> None (Sets room width and height)
+    def sizeRoomLegacy(self):
+        meanWidth, meanHeight, lowerBound, upperBoundWidth, upperBoundHeight = self.getRoomBounds()
+        standardDeviation = 1
+        
+        if(upperBoundWidth == lowerBound):
+            self.roomWidth = lowerBound
         else:
-            #Ready to make a room
-            #At bottom-level leaf
-            roomHeight = None
-            roomWidth = None
-            roomPosX = None #Top left corner of room
-            roomPosY = None
-            
-            #Middle value in range
-            meanWidth = round(((self.width - 2) + (self.minimumSize - 2)) / 2)
-            meanHeight = round(((self.height - 2) + (self.minimumSize - 2)) / 2)
-            upperBoundWidth = self.width - 2
-            upperBoundHeight = self.height - 2
-            
-            lowerBound = self.minimumSize - 2
-            
-            standardDeviation = 1
-            
-            if(upperBoundWidth == lowerBound):
-                roomWidth = lowerBound
-            else:
-                #print("Width Normal :", meanWidth, standardDeviation, lowerBound, upperBoundWidth)
-                widthNormal = self.create_truncated_normal(meanWidth, standardDeviation, lowerBound, upperBoundWidth)
-                roomWidth = round(widthNormal.rvs())
-            if(upperBoundHeight == lowerBound):
-                roomHeight = lowerBound
+            self.roomWidth = round(scipyStats.truncnorm.rvs((lowerBound - meanWidth) / standardDeviation, (upperBoundWidth - meanWidth) / standardDeviation, loc = meanWidth, scale = standardDeviation, random_state = self.config.numpyRng))
+        if(upperBoundHeight == lowerBound):
+            self.roomHeight = lowerBound
+        else:
+            self.roomHeight = round(scipyStats.truncnorm.rvs((lowerBound - meanHeight) / standardDeviation, (upperBoundHeight - meanHeight) / standardDeviation, loc = meanHeight, scale = standardDeviation, random_state = self.config.numpyRng))
+        
+    #Method to create a room inside this (bottom-level) leaf
+    #In -> List of Rooms
+    #Out-> None (Adds room to list)
+    def createRoom(self, roomList):
+        #Ready to make a room
+        #At bottom-level leaf
+        roomPosX = None #Top left corner of room
+        roomPosY = None
+        
+        #Gaussian selection of room sizes (chosen for every leaf beforehand by Dungeon.sizeRooms)
+        roomWidth = self.roomWidth
+        roomHeight = self.roomHeight
+        #print("Size: " + str(roomWidth) + "x" + str(roomHeight))
+        
+        #Determine room Position inside of leaf
+        roomPosX = self.config.rng.randint(1, self.width - roomWidth - 1)
+        roomPosY = self.config.rng.randint(1, self.height - roomHeight - 1)
+        
+        
+        #Adjust room position at random - Shift Up, Down, Left, or Right up to 10 tiles at random
+        #Decide whether this room will be moved (2/3 chance)
+        move = self.config.rng.randint(0,2)
+        if (move != 0):
+            #Determine how far to move this room - differs depending on dungeon Size
+            #Tiny : 1-3
+            #Small: 2-5
+            #Normal:3-7
+            #Large: 4-10
+            moveAmount = None
+            if (self.config.preset == "1"):
+                moveAmount = self.config.rng.randint(1,5)
+            elif (self.config.preset == "2"):
+                moveAmount = self.config.rng.randint(1,5)
+            elif (self.config.preset == "3"):
+                moveAmount = self.config.rng.randint(1,7)
+            elif (self.config.preset == "4"):
+                moveAmount = self.config.rng.randint(1,10)
             else:
-                #print("Height Normal: ", meanHeight, standardDeviation, lowerBound, upperBoundHeight)
-                heightNormal = self.create_truncated_normal(meanHeight, standardDeviation, lowerBound, upperBoundHeight)
-                roomHeight = round(heightNormal.rvs())
+                #Custom size -> Same as Large
+                moveAmount = self.config.rng.randint(1,10)
             
-            #Gaussian selection of room sizes
-            #print("Size: " + str(roomWidth) + "x" + str(roomHeight))
-            
-            #Determine room Position inside of leaf
-            roomPosX = random.randint(1, self.width - roomWidth - 1)
-            roomPosY = random.randint(1, self.height - roomHeight - 1)
+            #Determine which directions this room can move
+            moveableHorizontal = []
+            moveableVertical = []
+            #Check if room can move left - 
+            if (((self.x + roomPosX) - moveAmount) >= 1):
+                moveableHorizontal.append("left")
+            if (self.config.dungeonWidth > (self.x + roomPosX + roomWidth + moveAmount)):
+                moveableHorizontal.append("right")
+            if ((self.y + roomPosY - moveAmount) >= 1):
+                moveableVertical.append("up")
+            if (self.config.dungeonHeight > (self.y + roomPosY + roomHeight + moveAmount)):
+                moveableVertical.append("down")
+                
+            #Get random x and y direction from list of possible directions
+            ind = self.config.rng.randint(0, len(moveableHorizontal) - 1)
+            moveDirH = moveableHorizontal[ind]
             
+            ind = self.config.rng.randint(0, len(moveableVertical) - 1)
+            moveDirV = moveableVertical[ind]
             
-            #Adjust room position at random - Shift Up, Down, Left, or Right up to 10 tiles at random
-            #Decide whether this room will be moved (2/3 chance)
-            move = random.randint(0,2)
-            if (move != 0):
-                #Determine how far to move this room - differs depending on dungeon Size
-                #Tiny : 1-3
-                #Small: 2-5
-                #Normal:3-7
-                #Large: 4-10
-                moveAmount = None
-                if (self.dungeonWidth == 25):
-                    moveAmount = random.randint(1,5)
-                elif (self.dungeonWidth == 35):
-                    moveAmount = random.randint(1,5)
-                elif (self.dungeonWidth == 51):
-                    moveAmount = random.randint(1,7)
-                elif (self.dungeonWidth == 70):
-                    moveAmount = random.randint(1,10)
-                
-                #Determine which directions this room can move
-                moveableHorizontal = []
-                moveableVertical = []
-                #Check if room can move left - 
-                if (((self.x + roomPosX) - moveAmount) >= 1):
-                    moveableHorizontal.append("left")
-                if (self.dungeonWidth > (self.x + roomPosX + roomWidth + moveAmount)):
-                    moveableHorizontal.append("right")
-                if ((self.y + roomPosY - moveAmount) >= 1):
-                    moveableVertical.append("up")
-                if (self.dungeonHeight > (self.y + roomPosY + roomHeight + moveAmount)):
-                    moveableVertical.append("down")
-                    
-                #Get random x and y direction from list of possible directions
-                ind = random.randint(0, len(moveableHorizontal) - 1)
-                moveDirH = moveableHorizontal[ind]
-                
-                ind = random.randint(0, len(moveableVertical) - 1)
-                moveDirV = moveableVertical[ind]
+            #Move room by specified amount in correct direction
+            if (moveDirH == "left"):
+                roomPosX -= moveAmount
+            else:
+                roomPosX += moveAmount
                 
-                #Move room by specified amount in correct direction
-                if (moveDirH == "left"):
-                    roomPosX -= moveAmount
-                else:
-                    roomPosX += moveAmount
-                    
-                if (moveDirV == "up"):
-                    roomPosY -= moveAmount
-                else:
-                    roomPosY += moveAmount
-            #Create Room
-            self.room = Room(self.x + roomPosX, self.y + roomPosY, roomWidth, roomHeight)
-            #Add to rooms list
-            roomList.append(self.room)
+            if (moveDirV == "up"):
+                roomPosY -= moveAmount
+            else:
+                roomPosY += moveAmount
+        #Create Room
+        self.room = Room(self.x + roomPosX, self.y + roomPosY, roomWidth, roomHeight)
+        #Add to rooms list
+        roomList.append(self.room)
             
     #Method to create corridor between two rooms (Can use 1 of 2 corridor algorithms)
     #In -> Room1, Room2, List of Corridors
     #Out-> None (Adds corridors to list)
     def createCorridor(self, room1, room2, corridorList):
-        #Decide which corridor algorithm to use
-        #Drunkards Walk -> Randomly move until you hit the chosen room
-        if self.corridorAlgorithm == "Drunkard":
-            #print("Not implemented yet")
-            #Pick random point inside each room
-            point1X = random.randint(room1.getX() + 1 , room1.getX() + room1.getWidth() - 2)
-            point1Y = random.randint(room1.getY() + 1, room1.getY() + room1.getHeight() - 2)
-            point2X = random.randint(room2.getX() + 1, room2.getX() + room2.getWidth() - 2)
-            point2Y = random.randint(room2.getY() + 1, room2.getY() + room2.getHeight() - 2)
-            #print("Making corridor from {0},{1} to {2},{3}".format(point1X, point1Y, point2X, point2Y))
-            #Move randomly from Point1
-            currentX = point1X
-            currentY = point1Y
-            
-            direction1 = None
-            direction2 = None
-            #Decide which 2 directions to move
-            if point1X <= point2X:
-                direction1 = 1
-            else:
-                direction1 = -1
-            if point1Y <= point2Y:
-                direction2 = 1
-            else:
-                direction2 = -1
-                
-            while(currentX != point2X or currentY != point2Y):
-                #Decide whether to move in X or Y
-                if currentX == point2X:
-                    #Move Y
-                    currentY += direction2
-                elif currentY == point2Y:
-                    #Move X
-                    currentX += direction1
-                #Otherwise move randomly
+        connectRooms(room1, room2, corridorList, self.config)
+
+#Method to create corridor between two rooms (Can use 1 of 2 corridor algorithms)
+#In -> Room1, Room2, List of Corridors, DungeonConfig (gives corridor algorithm and random generator)
+#Out-> None (Adds corridors to list)
+def connectRooms(room1, room2, corridorList, config):
+    #Decide which corridor algorithm to use
+    #Drunkards Walk -> Randomly move until you hit the chosen room
+    if config.corridorAlgorithm == "Drunkard":
+        #print("Not implemented yet")
+        #Pick random point inside each room
+        point1X = config.rng.randint(room1.getX() + 1 , room1.getX() + room1.getWidth() - 2)
+        point1Y = config.rng.randint(room1.getY() + 1, room1.getY() + room1.getHeight() - 2)
+        point2X = config.rng.randint(room2.getX() + 1, room2.getX() + room2.getWidth() - 2)
+        point2Y = config.rng.randint(room2.getY() + 1, room2.getY() + room2.getHeight() - 2)
+        #print("Making corridor from {0},{1} to {2},{3}".format(point1X, point1Y, point2X, point2Y))
+        direction1 = None
+        direction2 = None
+        #Decide which 2 directions to move
+        if point1X <= point2X:
+            direction1 = 1
+        else:
+            direction1 = -1
+        if point1Y <= point2Y:
+            direction2 = 1
+        else:
+            direction2 = -1
+
+        #Move randomly from Point1 -> Decide whether each step is in X (0) or Y (1)
+        remainingX = abs(point2X - point1X)
+        remainingY = abs(point2Y - point1Y)
+        if config.corridorSteps == "legacy":
+            #Move randomly until one direction is complete, then finish the other
+            steps = []
+            while remainingX > 0 and remainingY > 0:
+                if(config.rng.randint(1,2) == 1):
+                    #Move in X
+                    steps.append(0)
+                    remainingX -= 1
                 else:
-                    if(random.randint(1,2) == 1):
-                        #Move in X
-                        currentX += direction1
-                    else:
-                        #Move in Y
-                        currentY += direction2
-                #print("Tile at {0},{1}".format(currentX, currentY))
-                corridorList.append(Corridor(currentX, currentY, 1, 1))
-            
-            
-        #BSP Corridor Algorithm
+                    #Move in Y
+                    steps.append(1)
+                    remainingY -= 1
+            steps.extend([0] * remainingX)
+            steps.extend([1] * remainingY)
         else:
-            #Pick random point inside each room
-            point1X = random.randint(room1.getX() + 1 , room1.getX() + room1.getWidth() - 2)
-            point1Y = random.randint(room1.getY() + 1, room1.getY() + room1.getHeight() - 2)
-            point2X = random.randint(room2.getX() + 1, room2.getX() + room2.getWidth() - 2)
-            point2Y = random.randint(room2.getY() + 1, room2.getY() + room2.getHeight() - 2)
-            
-            #Calculate width and height between points
-            w = point2X - point1X
-            h = point2Y - point1Y
-            
-            #print("Corridor {0}x{1}".format(w, h))
-            #print("From {0},{1} to {2},{3}".format(point1X, point1Y, point2X, point2Y))
-            #If width is negative (room 2 is left of room 1)
-            if w < 0:
-                #If height is negative (room 2 is above room 1)
-                if h < 0:
-                    #2/3 chance for single 1/3 chance for double
-                    if random.randint(0, 2) == 2:
-                        corridorList.append(Corridor(point2X, point1Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point2X, point2Y, 1, np.abs(h)))
-                    else:
-                        corridorList.append(Corridor(point2X, point2Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point1X, point2Y, 1, np.abs(h)))
-                        
-                #If height is positive (room 2 is below room 1)
-                elif h > 0:
-                    #2/3 chance for single 1/3 chance for double
-                    if random.randint(0, 2) == 2:
-                        corridorList.append(Corridor(point2X, point1Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point2X, point1Y, 1, np.abs(h)))
-                    else:
-                        corridorList.append(Corridor(point2X, point2Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point1X, point1Y, 1, np.abs(h+1))) #+1 here is a temp fix which may be removed if it causes errors
-                #If height is 0 (room 2 is at same height as room 1)
+            #Every step needed in X and Y, shuffled in one go
+            steps = config.numpyRng.permutation(np.repeat(np.array([0, 1], dtype=np.int8), [remainingX, remainingY]))
+
+        #Path is the running total of steps from Point1
+        if len(steps) > 0:
+            moveY = np.array(steps, dtype=bool)
+            pathX = point1X + np.cumsum(np.where(moveY, 0, direction1))
+            pathY = point1Y + np.cumsum(np.where(moveY, direction2, 0))
+            corridorList.append(CorridorPath(pathX, pathY))
+
+
+    #BSP Corridor Algorithm
+    else:
+        #Pick random point inside each room
+        point1X = config.rng.randint(room1.getX() + 1 , room1.getX() + room1.getWidth() - 2)
+        point1Y = config.rng.randint(room1.getY() + 1, room1.getY() + room1.getHeight() - 2)
+        point2X = config.rng.randint(room2.getX() + 1, room2.getX() + room2.getWidth() - 2)
+        point2Y = config.rng.randint(room2.getY() + 1, room2.getY() + room2.getHeight() - 2)
+
+        #Calculate width and height between points
+        w = point2X - point1X
+        h = point2Y - point1Y
+
+        #print("Corridor {0}x{1}".format(w, h))
+        #print("From {0},{1} to {2},{3}".format(point1X, point1Y, point2X, point2Y))
+        #If width is negative (room 2 is left of room 1)
+        if w < 0:
+            #If height is negative (room 2 is above room 1)
+            if h < 0:
+                #2/3 chance for single 1/3 chance for double
+                if config.rng.randint(0, 2) == 2:
+                    corridorList.append(Corridor(point2X, point1Y, np.abs(w), 1))
+                    corridorList.append(Corridor(point2X, point2Y, 1, np.abs(h)))
                 else:
                     corridorList.append(Corridor(point2X, point2Y, np.abs(w), 1))
-            #If width is positive (room 2 is right of room 1)
-            elif w > 0:
-                #If height is negative (room 2 is above room 1)
-                if h < 0:
-                    #2/3 chance for single 1/3 chance for double
-                    if random.randint(0, 2) == 2:
-                        corridorList.append(Corridor(point1X, point2Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point1X, point2Y, 1, np.abs(h)))
-                    else:
-                        corridorList.append(Corridor(point1X, point1Y, np.abs(w+1), 1)) #Another temp fix
-                        corridorList.append(Corridor(point2X, point2Y, 1, np.abs(h)))
-                #If height is positive (room 2 is below room 1)
-                elif h > 0:
-                    #2/3 chance for single 1/3 chance for double
-                    if random.randint(0, 2) == 2:
-                        corridorList.append(Corridor(point1X, point1Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point2X, point1Y, 1, np.abs(h)))
-                    else:
-                        corridorList.append(Corridor(point1X, point2Y, np.abs(w), 1))
-                        corridorList.append(Corridor(point1X, point1Y, 1, np.abs(h)))
-                #If height is 0 (room 2 is same height as room 1)
+                    corridorList.append(Corridor(point1X, point2Y, 1, np.abs(h)))
+
+            #If height is positive (room 2 is below room 1)
+            elif h > 0:
+                #2/3 chance for single 1/3 chance for double
+                if config.rng.randint(0, 2) == 2:
+                    corridorList.append(Corridor(point2X, point1Y, np.abs(w), 1))
+                    corridorList.append(Corridor(point2X, point1Y, 1, np.abs(h)))
                 else:
-                    corridorList.append(Corridor(point1X, point1Y, np.abs(w), 1))
-            #If width is 0 (Room 2 is at same x as room 1)
+                    corridorList.append(Corridor(point2X, point2Y, np.abs(w), 1))
+                    corridorList.append(Corridor(point1X, point1Y, 1, np.abs(h+1))) #+1 here is a temp fix which may be removed if it causes errors
+            #If height is 0 (room 2 is at same height as room 1)
             else:
-                if h < 0:
+                corridorList.append(Corridor(point2X, point2Y, np.abs(w), 1))
+        #If width is positive (room 2 is right of room 1)
+        elif w > 0:
+            #If height is negative (room 2 is above room 1)
+            if h < 0:
+                #2/3 chance for single 1/3 chance for double
+                if config.rng.randint(0, 2) == 2:
+                    corridorList.append(Corridor(point1X, point2Y, np.abs(w), 1))
+                    corridorList.append(Corridor(point1X, point2Y, 1, np.abs(h)))
+                else:
+                    corridorList.append(Corridor(point1X, point1Y, np.abs(w+1), 1)) #Another temp fix
                     corridorList.append(Corridor(point2X, point2Y, 1, np.abs(h)))
+            #If height is positive (room 2 is below room 1)
+            elif h > 0:
+                #2/3 chance for single 1/3 chance for double
+                if config.rng.randint(0, 2) == 2:
+                    corridorList.append(Corridor(point1X, point1Y, np.abs(w), 1))
+                    corridorList.append(Corridor(point2X, point1Y, 1, np.abs(h)))
                 else:
+                    corridorList.append(Corridor(point1X, point2Y, np.abs(w), 1))
                     corridorList.append(Corridor(point1X, point1Y, 1, np.abs(h)))
-                
+            #If height is 0 (room 2 is same height as room 1)
+            else:
+                corridorList.append(Corridor(point1X, point1Y, np.abs(w), 1))
+        #If width is 0 (Room 2 is at same x as room 1)
+        else:
+            if h < 0:
+                corridorList.append(Corridor(point2X, point2Y, 1, np.abs(h)))
+            else:
+                corridorList.append(Corridor(point1X, point1Y, 1, np.abs(h)))
 
+#LeafTree class
+#BSP tree of leaves stored as parallel arrays indexed by leaf number (root leaf = 0)
+#left/right hold the index of each child leaf (-1 if the leaf has not been split)
+#Splitting and traversal are done with a queue/stack rather than recursion, so large trees cannot reach the recursion limit
+class LeafTree:
+    x = None
+    y = None
+    width = None
+    height = None
+    left = None
+    right = None
+    leaves = None
+    rng = None
+    numpyRng = None
+    
+    #Constructor
+    #In -> Root leaf
+    def __init__(self, RootLeaf):
+        #Random generators of the Dungeon (used to size rooms and pick rooms to connect)
+        self.rng = RootLeaf.getConfig().getRandom()
+        self.numpyRng = RootLeaf.getConfig().getNumpyRandom()
+        self.x = []
+        self.y = []
+        self.width = []
+        self.height = []
+        self.left = []
+        self.right = []
+        self.leaves = []
+        self.addLeaf(RootLeaf)
+    
+    #Getter methods
+    def getLeaves(self):
+        return self.leaves
+    
+    def getLeaf(self, index):
+        return self.leaves[index]
+    
+    def getSize(self):
+        return len(self.leaves)
+    
+    #Method to add a leaf to the tree
+    #In -> Leaf
+    #Out -> Index of leaf
+    def addLeaf(self, leaf):
+        self.x.append(leaf.getX())
+        self.y.append(leaf.getY())
+        self.width.append(leaf.getWidth())
+        self.height.append(leaf.getHeight())
+        self.left.append(-1)
+        self.right.append(-1)
+        self.leaves.append(leaf)
+        return len(self.leaves) - 1
+    
+    #Method to check whether a leaf is too large and must be split
+    #In -> Leaf index
+    #Out -> Boolean
+    def isSplittable(self, index):
+        maximumLeafSize = self.leaves[index].getMaximumLeafSize()
+        return self.height[index] > maximumLeafSize or self.width[index] > maximumLeafSize
+    
+    #Method to split leaves until every leaf is small enough (BSP)
+    #Each splittable leaf is taken from a queue once, and its children are added to the back of the queue
+    #In -> None
+    #Out -> None (Adds leaves to tree)
+    def splitLeaves(self):
+        queue = deque()
+        if self.isSplittable(0):
+            queue.append(0)
+        while len(queue) > 0:
+            index = queue.popleft()
+            leaf = self.leaves[index]
+            #Check split actually happened
+            if leaf.split():
+                self.left[index] = self.addLeaf(leaf.getLeftChild())
+                self.right[index] = self.addLeaf(leaf.getRightChild())
+                for child in (self.left[index], self.right[index]):
+                    if self.isSplittable(child):
+                        queue.append(child)
+    
+    #Method to list leaves below (and including) a leaf in post-order - left subtree, right subtree, then the leaf itself
+    #In -> Index of leaf to start from
+    #Out -> List of leaf indexes
+    def postOrder(self, index = 0):
+        order = []
+        stack = [index]
+        while stack != []:
+            current = stack.pop()
+            order.append(current)
+            if self.left[current] != -1:
+                stack.append(self.left[current])
+                stack.append(self.right[current])
+        #Leaf, right, left order reversed gives left, right, leaf
+        order.reverse()
+        return order
+    
+    #Method to get every bottom-level leaf (in the order rooms are created)
+    #In -> None
+    #Out -> List of leaf indexes
+    def getBottomLeaves(self):
+        return [index for index in self.postOrder() if self.left[index] == -1]
+    
+    #Method to choose the size of the room in every bottom-level leaf
+    #In -> Room sizing method ("batch" or "legacy")
+    #Out -> None (Sets room width and height of each leaf)
+    def sizeRooms(self, roomSizing):
+        leaves = [self.leaves[index] for index in self.getBottomLeaves()]
+        if roomSizing == "legacy":
+            for leaf in leaves:
+                leaf.sizeRoomLegacy()
+            return
+        
+        #Collect size ranges of every leaf
+        bounds = np.array([leaf.getRoomBounds() for leaf in leaves], dtype=float).reshape(-1, 5)
+        means = np.concatenate((bounds[:, 0], bounds[:, 1]))
+        lows = np.concatenate((bounds[:, 2], bounds[:, 2]))
+        upps = np.concatenate((bounds[:, 3], bounds[:, 4]))
+        
+        #Sample every width and height at once (leaves with only one possible size use the lower bound)
+        sizes = lows.copy()
+        sample = upps != lows
+        sizes[sample] = sampleTruncatedNormal(means[sample], 1, lows[sample], upps[sample], self.numpyRng.random_sample(int(sample.sum())))
+        sizes = np.rint(sizes).astype(int)
+        
+        for i in range(0, len(leaves)):
+            leaves[i].roomWidth = int(sizes[i])
+            leaves[i].roomHeight = int(sizes[len(leaves) + i])
+    
+    #Method to get a room from a leaf
+    #If the leaf has been split, a room is chosen from below it - at each split there is a 50 percent chance to pick the left or right side
+    #In -> Leaf index
+    #Out -> Room
+    def getRoom(self, index):
+        chosen = {}
+        for current in self.postOrder(index):
+            if self.left[current] == -1:
+                chosen[current] = self.leaves[current].getRoom()
+                continue
+            leftRoom = chosen.pop(self.left[current])
+            rightRoom = chosen.pop(self.right[current])
+            #Check if both rooms are null
+            if leftRoom == None and rightRoom == None:
+                chosen[current] = None
+            elif rightRoom == None:
+                chosen[current] = leftRoom
+            elif leftRoom == None:
+                chosen[current] = rightRoom
+            #50 percent chance to return left or right from here
+            elif self.rng.randint(0,1) == 0:
+                chosen[current] = leftRoom
+            else:
+                chosen[current] = rightRoom
+        return chosen[index]
+    
+    #Method to create a room for each bottom-level leaf, and connect the two sides of each split leaf with a corridor
+    #Leaves are visited in post-order so both sides of a split have rooms before they are connected
+    #In -> List of corridors, list of Rooms, PhaseTracer
+    #Out-> None (Adds rooms and corridors to lists)
+    def createRooms(self, corridorList, roomList, tracer):
+        for index in self.postOrder():
+            leaf = self.leaves[index]
+            if self.left[index] == -1:
+                with tracer.phase("room creation") as event:
+                    leaf.createRoom(roomList)
+                    event.items = 1
+            else:
+                with tracer.phase("corridor creation") as event:
+                    corridorCount = len(corridorList)
+                    leaf.createCorridor(self.getRoom(self.left[index]), self.getRoom(self.right[index]), corridorList)
+                    event.items = len(corridorList) - corridorCount
             
+#Method to find which rooms overlap or touch each other
+#Uses sweep and prune -> Rooms are swept from left to right, and each room is only compared against rooms whose x range reaches it
+#In -> List of rooms
+#Out -> List of overlapping pairs, List of touching pairs (pairs of room indexes, lower index first, sorted)
+def findRoomRelations(rooms):
+    overlappingPairs = []
+    touchingPairs = []
+    #Get edges of each room
+    x1 = [room.getX() for room in rooms]
+    y1 = [room.getY() for room in rooms]
+    x2 = [x1[i] + rooms[i].getWidth() for i in range(0, len(rooms))]
+    y2 = [y1[i] + rooms[i].getHeight() for i in range(0, len(rooms))]
+    
+    #Rooms which may still reach the next room in the sweep
+    active = []
+    for i in sorted(range(0, len(rooms)), key=lambda ind: x1[ind]):
+        #Remove rooms which end before this room starts
+        active = [j for j in active if x2[j] >= x1[i]]
+        for j in active:
+            #Rooms can only touch or overlap if they also meet vertically
+            if y1[i] > y2[j] or y1[j] > y2[i]:
+                continue
+            pair = (min(i, j), max(i, j))
+            #Check for overlap of rooms
+            if x1[i] >= x2[j] or x1[j] >= x2[i] or y1[i] >= y2[j] or y1[j] >= y2[i]:
+                touchingPairs.append(pair)
+            else:
+                overlappingPairs.append(pair)
+        active.append(i)
+    
+    overlappingPairs.sort()
+    touchingPairs.sort()
+    return overlappingPairs, touchingPairs
+
+#Custom Dungeon sizes
+#Smallest and largest width/height allowed (the largest can still be streamed as one image, see dungeonRendering.streamImage)
+minimumCustomSize = 32
+maximumCustomSize = 2048
+#Custom sized Dungeons are split into chunks of at least this many tiles in each direction
+chunkSize = 128
+#Fewest chunks created in worker processes -> Fewer chunks are quicker to create than to start the workers
+minimumParallelChunks = 16
+#Largest Dungeon (number of tiles) drawn as a single image
+maximumImageTiles = 256 * 256
+
+#Method to read custom Dungeon dimensions from a Size
+#In -> Size ("1"-"4", or custom dimensions as "WidthxHeight" e.g "500x500")
+#Out -> Width, Height (None, None if Size is not a custom size)
+def parseDimensions(Size):
+    match = re.fullmatch(r"\s*(\d+)\s*[xX]\s*(\d+)\s*", str(Size))
+    if match == None:
+        return None, None
+    width = int(match.group(1))
+    height = int(match.group(2))
+    if min(width, height) < minimumCustomSize or max(width, height) > maximumCustomSize:
+        raise ValueError("Custom Dungeon size must be between {0} and {1} tiles in each direction".format(minimumCustomSize, maximumCustomSize))
+    return width, height
+
+#Method to split a custom sized Dungeon into chunks
+#Each direction is split evenly into as many chunks as fit at least chunkSize tiles
+#In -> Dungeon width, Dungeon height
+#Out -> List of chunks (x, y, width, height)
+def chunkLayout(width, height):
+    countX = max(1, width // chunkSize)
+    countY = max(1, height // chunkSize)
+    edgesX = [(i * width) // countX for i in range(0, countX + 1)]
+    edgesY = [(i * height) // countY for i in range(0, countY + 1)]
+    chunks = []
+    for i in range(0, countX):
+        for j in range(0, countY):
+            chunks.append((edgesX[i], edgesY[j], edgesX[i + 1] - edgesX[i], edgesY[j + 1] - edgesY[j]))
+    return chunks
+
+#Method to create the random generators for part of a Dungeon from a SeedSequence
+#In -> numpy SeedSequence
+#Out -> random.Random, numpy RandomState
+def createGenerators(seed):
+    pythonSeed, numpySeed = seed.spawn(2)
+    rng = random.Random(int.from_bytes(pythonSeed.generate_state(4).tobytes(), "little"))
+    numpyRng = np.random.RandomState(np.random.MT19937(numpySeed))
+    return rng, numpyRng
+
+#Method to create the rooms and corridors of one chunk of a custom sized Dungeon (run in a worker process when chunks are created in parallel)
+#In -> Chunk (x, y, width, height), CorridorAlgorithm, Room sizing method, Drunkards Walk step method, SeedSequence for this chunk
+#Out -> List of rooms, List of corridors (in Dungeon co-ordinates)
+def generateChunk(Chunk, CorridorAlg, RoomSizing, CorridorSteps, Seed):
+    chunkX, chunkY, chunkWidth, chunkHeight = Chunk
+    rng, numpyRng = createGenerators(Seed)
+    config = DungeonConfig(CorridorAlg, "custom", chunkWidth, chunkHeight, rng, numpyRng, CorridorSteps)
+    #Leave a border inside the chunk so rooms of neighbouring chunks never overlap
+    tree = LeafTree(Leaf(2, 2, chunkWidth - 4, chunkHeight - 4, config))
+    tree.splitLeaves()
+    tree.sizeRooms(RoomSizing)
+    rooms = []
+    corridors = []
+    tree.createRooms(corridors, rooms, PhaseTracer())
+    
+    #Move rooms and corridors from chunk co-ordinates to Dungeon co-ordinates
+    movedRooms = [Room(room.getX() + chunkX, room.getY() + chunkY, room.getWidth(), room.getHeight()) for room in rooms]
+    movedCorridors = []
+    for corridor in corridors:
+        if isinstance(corridor, CorridorPath):
+            movedCorridors.append(CorridorPath(corridor.getPathX() + chunkX, corridor.getPathY() + chunkY))
+        else:
+            movedCorridors.append(Corridor(corridor.getX() + chunkX, corridor.getY() + chunkY, corridor.getWidth(), corridor.getHeight()))
+    return movedRooms, movedCorridors
+    
 #Dungeon class to hold a complete dungeon
 class Dungeon:
     width = None
@@ -874,23 +1272,32 @@ class Dungeon:
     childRooms = None
     corridors = None
     rootLeaf = None
+    leafTree = None
+    config = None
     grid = None
     seed = None
     imageBase = None
+    imageBytes = None
     imageEnemies = None
-    splitOccured = None
     encounterText = None
     shape = None
     populationDensity = None
     
     tileset = None
+    tracer = None
+    roomSizing = None
+    chunked = None
+    workers = None
+    render = None
     
     
     
     #Constructor
-    #In -> Dungeon size, Dungeon Shape, CorridorAlgorithm, Tileset
+    #In -> Dungeon size ("1"-"4", or custom dimensions such as "500x500"), Dungeon Shape, CorridorAlgorithm, Tileset, PhaseTracer (optional), Room sizing method ("batch" or "legacy"),
+    #      random.Random and numpy RandomState to draw from (optional, the global random and np.random are used if not given),
+    #      Number of worker processes used to create chunks of custom sized Dungeons, Whether to draw the Dungeon image, Drunkards Walk step method ("batch" or "legacy")
     #Out -> Nothing
-    def __init__(self, Size, Shape, CorridorAlg, Tileset):
+    def __init__(self, Size, Shape, CorridorAlg, Tileset, Tracer = None, RoomSizing = "batch", Rng = None, NumpyRng = None, Workers = 1, Render = True, CorridorSteps = "batch"):
         
         #Shapes
         #Square: AxA
@@ -900,7 +1307,13 @@ class Dungeon:
         rootHeight = None
         rootWidth = None
         
-        if Shape == "Square":
+        #Custom size (e.g "500x500") -> Created in chunks, Shape is not used
+        customWidth, customHeight = parseDimensions(Size)
+        self.chunked = customWidth != None
+        if self.chunked:
+            self.width = customWidth
+            self.height = customHeight
+        elif Shape == "Square":
             #Sizes
             #Tiny: 15x15 (25x25) + 5 each side
             #Small 25x25    (35x35) + 5 each side
@@ -985,7 +1398,7 @@ class Dungeon:
                 rootHeight = 15
                 rootWidth = 25
         else:
-            print("Error")
+            log("Error: Unknown shape {0}".format(Shape), ERROR)
         #Set Seed
         #self.seed = random.randint(0,999999)
         #print("Seed: {0}".format(self.seed))
@@ -999,10 +1412,41 @@ class Dungeon:
         #Set Tileset
         self.tileset = Tileset
         
+        #Set method used to choose room sizes
+        #"batch" -> All room sizes are sampled at once
+        #"legacy" -> Room sizes are sampled per leaf, giving the same dungeons as older versions for a given seed
+        self.roomSizing = RoomSizing
+        
+        #Set tracer used to time each phase of generation
+        if Tracer == None:
+            Tracer = PhaseTracer()
+        self.tracer = Tracer
+        
         #Create root leaf
-        self.rootLeaf = Leaf(rootX, rootY, rootWidth, rootHeight, CorridorAlg, self.width, self.height)
-        #Add root leaf to leaves list
-        self.leaves.append(self.rootLeaf)
+        if Rng == None:
+            Rng = random
+        if NumpyRng == None:
+            NumpyRng = np.random
+        #Set method used to choose the steps of Drunkards Walk corridors
+        #"batch" -> Steps of each corridor are shuffled as one array
+        #"legacy" -> Each step is chosen in turn, giving the same dungeons as older versions for a given seed
+        
+        #Leaf and room settings follow the size preset -> Unknown sizes default to Small, custom sizes use the Large settings
+        if self.chunked:
+            preset = "custom"
+        elif Size in ("1", "2", "3", "4"):
+            preset = Size
+        else:
+            preset = "2"
+        self.config = DungeonConfig(CorridorAlg, preset, self.width, self.height, Rng, NumpyRng, CorridorSteps)
+        self.workers = Workers
+        self.render = Render
+        #Custom sized Dungeons have a leaf tree for each chunk instead (see generateChunk)
+        if not self.chunked:
+            self.rootLeaf = Leaf(rootX, rootY, rootWidth, rootHeight, self.config)
+            #Add root leaf to leaf tree
+            self.leafTree = LeafTree(self.rootLeaf)
+            self.leaves = self.leafTree.getLeaves()
         #Start generating dungeon
         self.generateDungeon()
         
@@ -1019,9 +1463,18 @@ class Dungeon:
     def getRooms(self):
         return self.rooms
     
+    def getCorridors(self):
+        return self.corridors
+    
     def getRootLeaf(self):
         return self.rootLeaf
     
+    def getLeafTree(self):
+        return self.leafTree
+    
+    def getConfig(self):
+        return self.config
+    
     def getGrid(self):
         return self.grid
         
@@ -1031,324 +1484,283 @@ class Dungeon:
     def getImage(self):
         return self.imageBase
     
+    def getImageBytes(self):
+        return self.imageBytes
+    
     def getEncounterText(self):
         return self.encounterText
     
+    def getTracer(self):
+        return self.tracer
+    
    #Method to create image from grid
    #In -> List of Rooms, Chosen tileset
-   #Out -> None (Creates image and saves to static folder)
+   #Out -> Image encoded as PNG bytes (Image is kept in memory rather than saved to static folder)
     def createImage(self, rooms, tileset):
     
         #print("Tileset: {0}".format(tileset))
-        #Dimensions of a single tile
-        imHeight = 16
-        imWidth = 16
-        #Room Tiles
-        #0 = None
-        #1 = Normal
-        #2 = Left
-        #3 = Right
-        #4 = Down
-        #5 = Top
-        #6 = TopLeft
-        #7 = TopRight
-        #8 = BottomLeft
-        #9 = BottomRight
-        
-        #Corridor tiles
-        #10 = Single Vertical
-        #11 = Single Horizontal
-        #12 = Double Vertial Left
-        #13 = Double Vertical Right
-        #14 = Double Horizontal Top
-        #15 = Double Horizontal Bottom
-        #16 = Top Left Corner
-        #17 = Top Right Corner
-        #18 = Bottom Left Corner
-        #19 = Bottom Right Corner
-        #20 = Crossroads
-        #21 = Not Left
-        #22 = Not Right
-        #23 = Not Up
-        #24 = Not Down
-        #25 = Undefined
-        
-        #Create images
-        blank = Image.open("sprites/" + tileset + "Tiles/blank.png")
-        center = Image.open("sprites/" + tileset + "Tiles/Tile.png")
-        bottom = Image.open("sprites/" + tileset + "Tiles/Bottom.png")
-        top = Image.open("sprites/" + tileset + "Tiles/Top.png")
-        left = Image.open("sprites/" + tileset + "Tiles/Left.png")
-        right = Image.open("sprites/" + tileset + "Tiles/Right.png")
-        topleft = Image.open("sprites/" + tileset + "Tiles/Topleft.png")
-        topright = Image.open("sprites/" + tileset + "Tiles/Topright.png")
-        bottomleft = Image.open("sprites/" + tileset + "Tiles/Bottomleft.png")
-        bottomright = Image.open("sprites/" + tileset + "Tiles/Bottomright.png")
-        
-        vertical = Image.open("sprites/" + tileset + "Tiles/CorridorSingleVertical.png")
-        horizontal = Image.open("sprites/" + tileset + "Tiles/CorridorSingleHorizontal.png")
-        
-        topleftCorridor = Image.open("sprites/" + tileset + "Tiles/CorridorTopLeftCorner.png")
-        toprightCorridor = Image.open("sprites/" + tileset + "Tiles/CorridorTopRightCorner.png")
-        bottomleftCorridor = Image.open("sprites/" + tileset + "Tiles/CorridorBottomLeftCorner.png")
-        bottomrightCorridor = Image.open("sprites/" + tileset + "Tiles/CorridorBottomRightCorner.png")
-        
-        crossroad = Image.open("sprites/" + tileset + "Tiles/CorridorCrossroad.png")
+        #Draw every tile of the grid in one step (tile values are listed in dungeonTilesets.tileRoles), then label rooms with Numbers
+        self.imageBase = renderImage(self.grid.getGrid(), rooms, tileset)
+        #Encode image in memory
+        self.imageBytes = encodePNG(self.imageBase)
+        #imageBase.show()
+        return self.imageBytes
         
-        notleft = Image.open("sprites/" + tileset + "Tiles/CorridorNotLeft.png")
-        notright = Image.open("sprites/" + tileset + "Tiles/CorridorNotRight.png")
-        notup = Image.open("sprites/" + tileset + "Tiles/CorridorNotUp.png")
-        notdown = Image.open("sprites/" + tileset + "Tiles/CorridorNotDown.png")
+   
+    #Method to merge overlapping rooms into composite rooms
+    #In -> None
+    #Out -> List of indexes of rooms touching another room
+    def mergeRooms(self):
+        #Now determine which rooms are overlapping or touching
+        overlappingPairs, touchingPairs = findRoomRelations(self.rooms)
         
-        doubleVLeft = Image.open("sprites/" + tileset + "Tiles/CorridorDoubleVerticalLeft.png")
-        doubleVRight = Image.open("sprites/" + tileset + "Tiles/CorridorDoubleVerticalRight.png")
-        doubleHTop = Image.open("sprites/" + tileset + "Tiles/CorridorDoubleHorizontalTop.png")
-        doubleHBottom = Image.open("sprites/" + tileset + "Tiles/CorridorDoubleHorizontalBottom.png")
+        #Merge overlapping rooms into groups
+        groups = DisjointSet(len(self.rooms))
+        for i, j in overlappingPairs:
+            groups.union(i, j)
         
-          
-        #Create empty picture grid
-        pics = []
-        #Create an image for each row
-        for row in self.grid.getGrid():
-            #Create image from list
-            pic = Image.new("RGB", (len(row) * imWidth, imHeight))
-            for i in range(0, len(row)):
-                im = row[i]
-                if im == 0:
-                    pic.paste(blank, (i * imWidth, 0))
-                elif im == 1:
-                    pic.paste(center, (i * imWidth, 0))
-                elif im == 2:
-                    pic.paste(left, (i * imWidth, 0))
-                elif im == 3:
-                    pic.paste(right, (i * imWidth, 0))
-                elif im == 5:
-                    pic.paste(top, (i * imWidth, 0))
-                elif im == 4:
-                    pic.paste(bottom, (i * imWidth, 0))
-                elif im == 6:
-                    pic.paste(topleft, (i * imWidth, 0))
-                elif im == 7:
-                    pic.paste(topright, (i * imWidth, 0))
-                elif im == 8:
-                    pic.paste(bottomleft, (i * imWidth, 0))
-                elif im == 9:
-                    pic.paste(bottomright, (i * imWidth, 0))
-                elif im == 10:
-                    pic.paste(vertical, (i * imWidth, 0))
-                elif im == 11:
-                    pic.paste(horizontal, (i * imWidth, 0))
-                elif im == 12:
-                    pic.paste(doubleVLeft, (i * imWidth, 0))
-                elif im == 13:
-                    pic.paste(doubleVRight, (i * imWidth, 0))
-                elif im == 14:
-                    pic.paste(doubleHTop, (i * imWidth, 0))
-                elif im == 15:
-                    pic.paste(doubleHBottom, (i * imWidth, 0))
-                elif im == 16:
-                    pic.paste(topleftCorridor, (i * imWidth, 0))
-                elif im == 17:
-                    pic.paste(toprightCorridor, (i * imWidth, 0))
-                elif im == 18:
-                    pic.paste(bottomleftCorridor, (i * imWidth, 0))
-                elif im == 19:
-                    pic.paste(bottomrightCorridor, (i * imWidth, 0))
-                elif im == 20:
-                    pic.paste(crossroad, (i * imWidth, 0))
-                elif im == 21:
-                    pic.paste(notleft, (i * imWidth, 0))
-                elif im == 22:
-                    pic.paste(notright, (i * imWidth, 0))
-                elif im == 23:
-                    pic.paste(notup, (i * imWidth, 0))
-                elif im == 24:
-                    pic.paste(notdown, (i * imWidth, 0))
-            #pic.show()
-            pics.append(pic)
-        #Concatenate row image together
-        pic = Image.new("RGB", (pics[0].width, pics[0].height * len(pics)))
-        for i in range(0, len(pics)):
-            pic.paste(pics[i], (0, i * pics[i].height))
+        #Create one room for each group -> Rooms that are not merged are kept as they are
+        members = {}
+        for i in range(0, len(self.rooms)):
+            members.setdefault(groups.find(i), []).append(self.rooms[i])
+        mergedRooms = []
+        roomIndexes = {}
+        for root in sorted(members.keys()):
+            roomIndexes[root] = len(mergedRooms)
+            if len(members[root]) == 1:
+                mergedRooms.append(members[root][0])
+            else:
+                mergedRooms.append(CompositeRoom(members[root]))
+                self.childRooms.extend(members[root][1:])
         
+        #Rooms touching (by index in merged list) -> Rooms touching part of their own group are already merged
+        touchingRooms = []
+        for i, j in touchingPairs:
+            if groups.find(i) != groups.find(j):
+                touchingRooms.append(roomIndexes[groups.find(i)])
         
-        font = ImageFont.truetype("times-ro.ttf", 12)
-        d = ImageDraw.Draw(pic)
-        #Label rooms with Numbers
-        for room in rooms:
-            ind = rooms.index(room) + 1
-            posX = (room.getY() * imHeight) + (imHeight/5 * 2)
-            posY = (room.getX() * imWidth) + (imWidth/5 * 2)
-            d.text((posX, posY), str(ind), (0,0,0), font=font)
+        self.rooms = mergedRooms
+        return touchingRooms
+    
+    #Method to fix touching rooms that have walls unconstructed
+    #In -> List of indexes of rooms touching another room
+    #Out -> None
+    def repairWalls(self, touchingRooms):
+        log(touchingRooms, DEBUG)
+        for roomIndex in touchingRooms:
+            #Get room
+            room = self.rooms[roomIndex]
+            #Walls of merged rooms are placed from their footprint
+            if isinstance(room, CompositeRoom):
+                continue
+            #Alter edge tiles
+            #Start with Left and right tiles (Including corners
+            for i in range (room.getX(), room.getX() + room.getWidth() - 1):
+                if i == room.getX():
+                    self.grid.grid[i][room.getY()] = 6
+                    self.grid.grid[i][room.getY() + room.getHeight() - 1] = 7
+                elif i == (room.getX() + room.getWidth() - 1):
+                    self.grid.grid[i][room.getY()] = 8
+                    self.grid.grid[i][room.getY() + room.getHeight() - 1] = 9
+                else:
+                    self.grid.grid[i][room.getY()] = 2
+                    self.grid.grid[i][room.getY() + room.getHeight() - 1] = 3
             
+            #Now do Top and Bottom Tiles
+            for i in range (room.getY(), room.getY() + room.getHeight() - 1):
+                if i == room.getY():
+                    self.grid.grid[room.getX()][i] = 6
+                    self.grid.grid[room.getX() + room.getWidth() - 1][i] = 8
+                elif i == (room.getY() + room.getHeight() - 1):
+                    self.grid.grid[room.getX()][i] = 7
+                    self.grid.grid[room.getX() + room.getWidth() - 1][i] = 9
+                else:
+                    self.grid.grid[room.getX()][i] = 5
+                    self.grid.grid[room.getX() + room.getWidth() - 1][i] = 4
+    
+    #Method to create the rooms and corridors of a custom sized Dungeon
+    #The Dungeon is split into chunks which are each created as a separate BSP tree (in worker processes if Workers > 1 and there are enough chunks),
+    #then corridors are added to join each chunk to its neighbours
+    #Each chunk has its own random generators spawned from the Dungeon's generator, so the Dungeon is the same whatever the number of workers
+    #In -> None
+    #Out -> None (Adds rooms and corridors to lists)
+    def generateChunks(self):
+        chunks = chunkLayout(self.width, self.height)
+        #One seed for each chunk, and one for the corridors between chunks
+        seeds = np.random.SeedSequence(self.config.getRandom().getrandbits(128)).spawn(len(chunks) + 1)
         
-        imageBase = pic
-        imageBase.save('static/LatestDungeon.PNG', 'PNG')
-        #imageBase.show()
+        with self.tracer.phase("chunk generation") as event:
+            jobs = [(chunks[i], self.config.getCorridorAlgorithm(), self.roomSizing, self.config.getCorridorSteps(), seeds[i]) for i in range(0, len(chunks))]
+            workers = min(self.workers, len(jobs), os.cpu_count() or 1)
+            if workers > 1 and len(jobs) >= minimumParallelChunks:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    #Results are returned in chunk order
+                    results = list(pool.map(generateChunk, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4))))
+            else:
+                results = [generateChunk(*job) for job in jobs]
+            chunkRooms = []
+            for rooms, corridors in results:
+                chunkRooms.append(rooms)
+                self.rooms.extend(rooms)
+                self.corridors.extend(corridors)
+            event.items = len(chunks)
         
-   
+        with self.tracer.phase("chunk stitching") as event:
+            event.items = self.stitchChunks(chunks, chunkRooms, seeds[-1])
+    
+    #Method to join each chunk to the chunks next to it with a corridor
+    #The corridor joins the room of each chunk closest to the edge they share
+    #In -> List of chunks, List of rooms for each chunk, SeedSequence for corridors
+    #Out -> Number of corridors added
+    def stitchChunks(self, chunks, chunkRooms, seed):
+        rng, numpyRng = createGenerators(seed)
+        config = DungeonConfig(self.config.getCorridorAlgorithm(), "custom", self.width, self.height, rng, numpyRng, self.config.getCorridorSteps())
+        chunkIndexes = {}
+        for i in range(0, len(chunks)):
+            chunkIndexes[(chunks[i][0], chunks[i][1])] = i
+        
+        count = 0
+        for i in range(0, len(chunks)):
+            chunkX, chunkY, chunkWidth, chunkHeight = chunks[i]
+            #Next chunk in x
+            neighbour = chunkIndexes.get((chunkX + chunkWidth, chunkY))
+            if neighbour != None:
+                room1 = max(chunkRooms[i], key=lambda room: room.getX() + room.getWidth())
+                room2 = min(chunkRooms[neighbour], key=lambda room: room.getX())
+                connectRooms(room1, room2, self.corridors, config)
+                count += 1
+            #Next chunk in y
+            neighbour = chunkIndexes.get((chunkX, chunkY + chunkHeight))
+            if neighbour != None:
+                room1 = max(chunkRooms[i], key=lambda room: room.getY() + room.getHeight())
+                room2 = min(chunkRooms[neighbour], key=lambda room: room.getY())
+                connectRooms(room1, room2, self.corridors, config)
+                count += 1
+        return count
+    
     #Dungeon generation method
     #In -> None
     #Out -> None
     def generateDungeon(self):
-    
-        #Set splitOccured boolean to True to start splitting
-        self.splitOccured = True
-        
-        #Whilst a new split has happened
-        while(self.splitOccured):
-            #Set splitOccured to false until a split happens
-            self.splitOccured = False
-            #Iterate over every leaf checking if they can be split
-            for leaf in self.leaves:
-                #Check if both children are Null
-                if leaf.getLeftChild() == None and leaf.getRightChild() == None:
-                    #Check if leaf is too large
-                    if leaf.getHeight() > leaf.getMaximumLeafSize() or leaf.getWidth() > leaf.getMaximumLeafSize():
-                        #Split Leaf
-                        temp = leaf.split()
-                        #Check if split actually happened
-                        if temp:
-                            #Add child leaves to leafList
-                            self.leaves.append(leaf.getLeftChild())
-                            self.leaves.append(leaf.getRightChild())
-                            #Set splitOccured to true
-                            self.splitOccured = True
-        
-        #Now start creating rooms from rootLeaf -> This will automatically start creating corridors as well
-        self.rootLeaf.createRooms(self.corridors, self.rooms)
-        
-        touchingRooms = []
-        toRemove = []
-        #Now determine whether any rooms are overlapping
-        for i in range(0, len(self.rooms)):
-            #Get current room
-            room1 = self.rooms[i]
-            #Check current rooms co-ords against every other room after it 
-            for j in range (i + 1, len(self.rooms)):
-                room2 = self.rooms[j]
-                r1x1 = room1.getX()
-                r1y1 = room1.getY()
-                r1x2 = r1x1 + room1.getWidth()
-                r1y2 = r1y1 + room1.getHeight()
-                #print("Room 1: ", r1x, ",", r1y)
-                
-                r2x1 = room2.getX()
-                r2y1 = room2.getY()
-                r2x2 = r2x1+ room2.getWidth()
-                r2y2 = r2y1 + room2.getHeight()
-                #print("Room 2: ", r2x, ",", r2y)
-                
-                #Check for overlap of rooms
-                if(r1x1 >= r2x2 or r2x1 >= r1x2 or r1y1 >= r2y2 or r2y1 >= r1y2):
-                    print("No Overlap")
-                    #Now check if rooms are touching
-                    if (r1x1 > r2x2 or r2x1 > r1x2):
-                        print("Not touching Horizontally")
-                    else:
-                        print("Touching Horizontally")
-                        if (r1y1 > r2y2 or r2y1 > r1y2):
-                            print("Not touching Vertically")
-                        else:
-                            print("Touching Vertically")
-                            #Rooms touching
-                            touchingRooms.append(self.rooms.index(room1))
-                      
-                else:
-                    print("Overlap")
-                    #If an overlap is found -> Check if room 1 has a child
-                    room = self.rooms[i]
-                    while (room.childRoom != None):
-                        temp = room.childRoom
-                        room = temp
-                    room.childRoom = self.rooms[j]
-                    if room.childRoom not in self.childRooms:
-                        self.childRooms.append(self.rooms[j])
+        if self.chunked:
+            self.generateChunks()
+        else:
+            #Split leaves
+            with self.tracer.phase("bsp split") as event:
+                self.leafTree.splitLeaves()
+                event.items = len(self.leaves)
+            
+            #Choose size of every room
+            with self.tracer.phase("room sizing") as event:
+                self.leafTree.sizeRooms(self.roomSizing)
+                event.items = len(self.leaves)
+            
+            #Now create rooms for every bottom-level leaf -> This will also create corridors between them
+            self.leafTree.createRooms(self.corridors, self.rooms, self.tracer)
         
-        #Now remove rooms that need to be removed
-        for i in range(0, len(self.childRooms)):
-            self.rooms.remove(self.childRooms[i])
-           
+        #Now merge overlapping rooms
+        with self.tracer.phase("overlap resolution") as event:
+            touchingRooms = self.mergeRooms()
+            event.items = len(self.childRooms)
         
         #Now create 2D grid
-        self.grid = Grid(self.width, self.height, self.rooms, self.corridors, self.childRooms)
+        with self.tracer.phase("grid autotiling") as event:
+            self.grid = Grid(self.width, self.height, self.rooms, self.corridors)
+            event.items = self.width * self.height
+        
         #Fix touching rooms that have walls unconstructed
-        print(touchingRooms)
-        for roomIndex in touchingRooms:
-            #Get room
-            try:
-                room = self.rooms[roomIndex]
-                #Alter edge tiles
-                #Start with Left and right tiles (Including corners
-                for i in range (room.getX(), room.getX() + room.getWidth() - 1):
-                    if i == room.getX():
-                        self.grid.grid[i][room.getY()] = 6
-                        self.grid.grid[i][room.getY() + room.getHeight() - 1] = 7
-                    elif i == (room.getX() + room.getWidth() - 1):
-                        self.grid.grid[i][room.getY()] = 8
-                        self.grid.grid[i][room.getY() + room.getHeight() - 1] = 9
-                    else:
-                        self.grid.grid[i][room.getY()] = 2
-                        self.grid.grid[i][room.getY() + room.getHeight() - 1] = 3
-                
-                #Now do Top and Bottom Tiles
-                for i in range (room.getY(), room.getY() + room.getHeight() - 1):
-                    if i == room.getY():
-                        self.grid.grid[room.getX()][i] = 6
-                        self.grid.grid[room.getX() + room.getWidth() - 1][i] = 8
-                    elif i == (room.getY() + room.getHeight() - 1):
-                        self.grid.grid[room.getX()][i] = 7
-                        self.grid.grid[room.getX() + room.getWidth() - 1][i] = 9
-                    else:
-                        self.grid.grid[room.getX()][i] = 5
-                        self.grid.grid[room.getX() + room.getWidth() - 1][i] = 4
-            except:
-                print("Error: Room removed")
-                continue
-        #Now create Image 
-        self.createImage(self.rooms, self.tileset)
+        with self.tracer.phase("wall repair") as event:
+            self.repairWalls(touchingRooms)
+            event.items = len(touchingRooms)
         
-#Main method to create dungeon from parameters given through system arguments 
-#In -> Size, Shape, CorridorAlgorithm, Dungeon Seed, Population Seed, DungeonTheme, Party Size, Party Avg Level, PopulationDensity, Tileset
-#Out -> List of encounters (generated via dungeonPopulation.py), Dungeon Seed, Population Seed, Party Size, Party average level
-def main(Size, Shape, CorridorAlgorithm, DunSeed, PopSeed, Theme, PartySize, PartyLevel, PopDensity, Tileset):
-
+        #Now create Image (very large Dungeons are not drawn as a single image)
+        if not self.render:
+            log("Dungeon image not drawn", DEBUG)
+        elif self.width * self.height <= maximumImageTiles:
+            with self.tracer.phase("image render") as event:
+                self.createImage(self.rooms, self.tileset)
+                event.items = self.width * self.height
+        else:
+            log("Dungeon is too large to draw as a single image ({0}x{1})".format(self.width, self.height), INFO)
+        
+#Method to get the Dungeon for a set of parameters, from the cache if it has already been generated
+#In -> Size, Shape, CorridorAlgorithm, Dungeon Seed (0 for a random seed), Tileset, PhaseTracer (optional), Room sizing method ("batch" or "legacy"),
+#      Whether to use the Dungeon cache, Number of worker processes used to create chunks of custom sized Dungeons,
+#      Whether the Dungeon image is needed (if not, it is only drawn if already cached), Drunkards Walk step method ("batch" or "legacy")
+#Out -> CachedDungeon (grid, rooms, corridors and image), Dungeon Seed
+def getDungeon(Size, Shape, CorridorAlgorithm, DunSeed, Tileset, Tracer = None, RoomSizing = "batch", UseCache = True, Workers = 1, Render = True, CorridorSteps = "batch"):
+    tracer = Tracer
+    if tracer == None:
+        tracer = PhaseTracer()
+    
     #If seed is not given (0) then create new random seed
     chosenSeed = None
     if DunSeed == None:
         DunSeed = 0
     if int(DunSeed) == 0:
         chosenSeed = random.randint(1, 99999999)
-        random.seed(chosenSeed)
-        np.random.seed(chosenSeed)
     else:
-        random.seed(int(DunSeed))
-        np.random.seed(int(DunSeed))
         chosenSeed = DunSeed
-    print("Seed: {0}".format(chosenSeed))
-    #Generate Dungeon
-    dungeon = Dungeon(Size, Shape, CorridorAlgorithm, Tileset)
-    
-    
-    #Now handle population
+    log("Seed: {0}".format(chosenSeed), INFO)
+    #Check cache for a Dungeon generated with the same parameters
+    key = cacheKey(Size, Shape, CorridorAlgorithm, chosenSeed, Tileset, RoomSizing, CorridorSteps)
+    dungeon = None
+    if UseCache:
+        with tracer.phase("cache lookup") as event:
+            dungeon = dungeonCache.get(key)
+            event.items = 0 if dungeon == None else 1
+    if dungeon == None:
+        #Generate Dungeon with random generators for this request only (gives the same Dungeon as seeding the global random and np.random)
+        dungeonRng = random.Random(int(chosenSeed))
+        numpyRng = np.random.RandomState(int(chosenSeed))
+        generated = Dungeon(Size, Shape, CorridorAlgorithm, Tileset, tracer, RoomSizing, dungeonRng, numpyRng, Workers, Render, CorridorSteps)
+        dungeon = CachedDungeon(generated.getGrid().getGrid().copy(), generated.getRooms(), generated.getCorridors(), generated.getImageBytes())
+        if UseCache:
+            #Dungeons with a random seed are only kept in memory
+            dungeonCache.put(key, dungeon, int(DunSeed) != 0)
+    elif Render and dungeon.getImage() == None and dungeon.getGrid().size <= maximumImageTiles:
+        #Cached without an image -> Draw it from the cached grid
+        with tracer.phase("image render") as event:
+            image = encodePNG(renderImage(dungeon.getGrid(), dungeon.getRooms(), Tileset))
+            event.items = dungeon.getGrid().size
+        dungeon = CachedDungeon(dungeon.getGrid(), dungeon.getRooms(), dungeon.getCorridors(), image)
+        if UseCache:
+            #Dungeons with a random seed are only kept in memory
+            dungeonCache.put(key, dungeon, int(DunSeed) != 0)
+    return dungeon, chosenSeed
+
+#Method to populate the rooms of a Dungeon with enemies
+#In -> List of rooms, Population Seed (0 for a random seed), DungeonTheme, Party Size, Party Avg Level, PopulationDensity, PhaseTracer (optional)
+#Out -> List of encounters, Population Seed, Party Size, Party average level
+def populateRooms(Rooms, PopSeed, Theme, PartySize, PartyLevel, PopDensity, Tracer = None):
     #Set/determine population seed
     if int(PopSeed) == 0:
-        #Reset current random
-        random.seed()
         PopSeed = random.randint(1, 9999)
-        random.seed(PopSeed)
-    else:
-        random.seed(int(PopSeed))
+    populationRng = random.Random(int(PopSeed))
     #print("Population Seed: {0}".format(PopSeed))
     #Now populate dungeon with enemies -> By calling dungeonPopulation.populateDungeon()
-    encounters, partySize, partyLevel = populateDungeon(dungeon.getRooms(), PopSeed, Theme, int(PartySize), int(PartyLevel), PopDensity)
+    encounters, partySize, partyLevel = populateDungeon(Rooms, PopSeed, Theme, int(PartySize), int(PartyLevel), PopDensity, Tracer, populationRng)
+    return encounters, PopSeed, partySize, partyLevel
+
+#Main method to create dungeon from parameters given through system arguments 
+#In -> Size, Shape, CorridorAlgorithm, Dungeon Seed, Population Seed, DungeonTheme, Party Size, Party Avg Level, PopulationDensity, Tileset, Hook (optional function called with each PhaseEvent), Room sizing method ("batch" or "legacy"),
+#      Whether to use the Dungeon cache (turned off for batch generation, where each Dungeon is only made once),
+#      Number of worker processes used to create chunks of custom sized Dungeons, Drunkards Walk step method ("batch" or "legacy")
+#Out -> List of encounters (generated via dungeonPopulation.py), Dungeon Seed, Population Seed, Party Size, Party average level, Dungeon Image (PNG bytes, None if too large to draw), Timing report
+def main(Size, Shape, CorridorAlgorithm, DunSeed, PopSeed, Theme, PartySize, PartyLevel, PopDensity, Tileset, Hook = None, RoomSizing = "batch", UseCache = True, Workers = 1, CorridorSteps = "batch"):
+
+    #Create tracer to time each phase
+    tracer = PhaseTracer(Hook)
     
-    return encounters, chosenSeed, PopSeed, partySize, partyLevel
+    dungeon, chosenSeed = getDungeon(Size, Shape, CorridorAlgorithm, DunSeed, Tileset, tracer, RoomSizing, UseCache, Workers, CorridorSteps = CorridorSteps)
     
+    #Now handle population
+    encounters, PopSeed, partySize, partyLevel = populateRooms(dungeon.getRooms(), PopSeed, Theme, PartySize, PartyLevel, PopDensity, tracer)
     
-        
+    return encounters, chosenSeed, PopSeed, partySize, partyLevel, dungeon.getImage(), tracer.getReport()
 
- 
- 
- #if __name__ == "__main__":
-    #main()   
\ No newline at end of file
+#Create Dungeons in bulk from the command line (see dungeonBatch.py for arguments)
+#E.g python dungeonGeneration.py --seeds 1-1000 --size 3 --out maps
+if __name__ == "__main__":
+    from dungeonBatch import runBatch
+    sys.exit(runBatch(sys.argv[1:]))
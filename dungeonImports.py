@@ -0,0 +1,56 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonImports.py
+#   Description -   Python file to handle deferred loading of heavy dependencies (NumPy, SciPy, Pillow).
+#                   A LazyModule stands in for a module and only imports it the first time one of its attributes is used,
+#                   so importing the Dungeon modules (e.g when a server worker or the CLI starts) does not pay for libraries that are not needed yet.
+#
+#   Changelog   -   18/10/26    -   Created lazy module loader
+
+import importlib
+import threading
+
+#LazyModule class
+#Imports the named module on first attribute access, then passes every attribute lookup to it
+#LazyModule has no methods of its own (other than special methods) so it never hides an attribute of the real module (e.g numpy.load)
+class LazyModule:
+
+    #Constructor
+    #In -> Module name (e.g "scipy.stats")
+    def __init__(self, Name):
+        #Set directly in __dict__ as __setattr__ is passed to the real module
+        #Names end in __ so they do not hide attributes of the real module
+        self.__dict__["lazyName__"] = Name
+        self.__dict__["lazyModule__"] = None
+        self.__dict__["lazyLock__"] = threading.Lock()
+
+    #Only called for attributes not found on the LazyModule itself
+    def __getattr__(self, attribute):
+        return getattr(loadModule(self), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(loadModule(self), attribute, value)
+
+    #ToString
+    def __repr__(self):
+        state = "loaded" if isLoaded(self) else "not loaded"
+        return "<LazyModule {0} ({1})>".format(self.__dict__["lazyName__"], state)
+
+#Method to get the real module behind a LazyModule, importing it if needed
+#In -> LazyModule
+#Out -> Module
+def loadModule(lazy):
+    state = lazy.__dict__
+    module = state["lazyModule__"]
+    if module == None:
+        with state["lazyLock__"]:
+            module = state["lazyModule__"]
+            if module == None:
+                module = importlib.import_module(state["lazyName__"])
+                state["lazyModule__"] = module
+    return module
+
+#Method to check whether the module behind a LazyModule has been imported yet
+#In -> LazyModule
+#Out -> Boolean
+def isLoaded(lazy):
+    return lazy.__dict__["lazyModule__"] != None
@@ -0,0 +1,193 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonJobs.py
+#   Description -   Python file to handle creating Dungeons in the background, so web requests do not wait for generation.
+#                   Jobs are run by a pool of worker processes which import and load everything needed to create a Dungeon when they start,
+#                   so a job does not pay for imports or loading tilesets. The number of jobs waiting is limited, so a busy server
+#                   turns new jobs away rather than building an endless queue.
+#
+#   Changelog   -   18/10/26    -   Created background Dungeon job queue
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dungeonTracing import log, setLogLevel, ERROR, INFO
+
+#Default number of worker processes, jobs allowed to wait, and finished jobs kept
+defaultWorkers = max(1, (os.cpu_count() or 2) // 2)
+#Default number of processes used by each job to create chunks of custom sized Dungeons (shares the rest of the processors)
+defaultChunkWorkers = max(1, (os.cpu_count() or 1) // defaultWorkers)
+defaultMaxPending = 32
+defaultMaxJobs = 200
+
+#Method to set up each worker process
+#Imports the generator and loads heavy libraries, corridor table, tilesets and monster data before the first job arrives
+#In -> Log level
+#Out -> None
+def warmWorker(level):
+    setLogLevel(level)
+    import dungeonGeneration
+    import dungeonPopulation
+    import dungeonRendering
+    import dungeonTilesets
+    from dungeonImports import loadModule
+    for module in [dungeonGeneration.np, dungeonGeneration.scipyStats, dungeonGeneration.scipySpecial, dungeonRendering.Image, dungeonRendering.ImageDraw]:
+        loadModule(module)
+    dungeonGeneration.getCorridorTileTable()
+    for name in dungeonTilesets.getTilesetNames():
+        dungeonTilesets.getTileset(name)
+    dungeonTilesets.getFont()
+    dungeonPopulation.initDictionaries()
+
+#Method to create and populate a Dungeon (run in a worker process)
+#In -> Parameters (dictionary with size, shape, corridor, seed, tileset, roomSizing, corridorSteps, popSeed, theme, partySize, partyLevel, density),
+#      Number of processes used to create chunks of custom sized Dungeons
+#Out -> CachedDungeon, Dungeon Seed, List of encounters, Population Seed, Party Size, Party average level
+def generateJob(parameters, chunkWorkers = 1):
+    import dungeonGeneration
+    dungeon, dunSeed = dungeonGeneration.getDungeon(parameters["size"], parameters["shape"], parameters["corridor"], parameters["seed"], parameters["tileset"],
+                                                    RoomSizing = parameters["roomSizing"], Workers = chunkWorkers, CorridorSteps = parameters["corridorSteps"])
+    encounters, popSeed, partySize, partyLevel = dungeonGeneration.populateRooms(dungeon.getRooms(), parameters["popSeed"], parameters["theme"],
+                                                                                 parameters["partySize"], parameters["partyLevel"], parameters["density"])
+    return dungeon, dunSeed, encounters, popSeed, partySize, partyLevel
+
+#Job class
+#A Dungeon being created in the background
+class Job:
+    jobId = None
+    parameters = None
+    future = None
+    created = None
+    data = None
+
+    #Constructor
+    #In -> Job id, Parameters, Future of the worker running the job
+    def __init__(self, JobId, Parameters, Future):
+        self.jobId = JobId
+        self.parameters = Parameters
+        self.future = Future
+        self.created = time.time()
+        #Anything the caller wants to keep with the job (e.g id of the stored dungeon)
+        self.data = {}
+
+    #Getter methods
+    def getId(self):
+        return self.jobId
+
+    def getParameters(self):
+        return self.parameters
+
+    def getCreated(self):
+        return self.created
+
+    def getData(self):
+        return self.data
+
+    def isDone(self):
+        return self.future.done()
+
+    #Method to get the state of the job
+    #Jobs of a worker pool which broke (e.g a worker ran out of memory) fail with BrokenProcessPool, or are cancelled if they had not started
+    #In -> None
+    #Out -> "queued", "running", "finished" or "failed"
+    def getStatus(self):
+        if not self.future.done():
+            return "running" if self.future.running() else "queued"
+        if self.future.cancelled():
+            return "failed"
+        return "failed" if self.future.exception() != None else "finished"
+
+    #Method to get the error of a failed job
+    #In -> None
+    #Out -> Error message (None if job has not failed)
+    def getError(self):
+        if not self.future.done():
+            return None
+        if self.future.cancelled():
+            return "Job was cancelled as the dungeon workers stopped"
+        if self.future.exception() == None:
+            return None
+        return repr(self.future.exception())
+
+    #Method to get the result of the job, waiting for it to finish
+    #In -> Seconds to wait (None to wait until finished)
+    #Out -> Result of generateJob (raises TimeoutError if not finished in time, or the job's error if it failed)
+    def getResult(self, timeout = None):
+        return self.future.result(timeout)
+
+#JobQueue class
+#Runs jobs on a pool of worker processes, started when the first job is added
+class JobQueue:
+    workers = None
+    chunkWorkers = None
+    maxPending = None
+    maxJobs = None
+    jobs = None
+    pool = None
+    lock = None
+
+    #Constructor
+    #In -> Number of worker processes, Number of jobs allowed to wait or run at once, Number of jobs kept (oldest finished jobs are removed),
+    #      Number of processes each job uses to create chunks of custom sized Dungeons
+    def __init__(self, Workers = defaultWorkers, MaxPending = defaultMaxPending, MaxJobs = defaultMaxJobs, ChunkWorkers = defaultChunkWorkers):
+        self.workers = Workers
+        self.chunkWorkers = ChunkWorkers
+        self.maxPending = MaxPending
+        self.maxJobs = MaxJobs
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    #Method to start the worker pool
+    #Workers are started with "spawn" as the web server has threads running, which are not safe to fork
+    #In -> None
+    #Out -> None
+    def startPool(self):
+        log("Starting {0} dungeon workers".format(self.workers), INFO)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=warmWorker, initargs=(ERROR,))
+
+    #Method to add a job
+    #In -> Parameters (see generateJob)
+    #Out -> Job (None if too many jobs are already waiting)
+    def submit(self, parameters):
+        with self.lock:
+            pending = sum(1 for job in self.jobs.values() if not job.isDone())
+            if pending >= self.maxPending:
+                return None
+            if self.pool == None:
+                self.startPool()
+            try:
+                future = self.pool.submit(generateJob, parameters, self.chunkWorkers)
+            except BrokenProcessPool:
+                #A worker died (e.g out of memory) -> Stop the broken pool (its unfinished jobs fail), then start a new pool
+                log("Dungeon worker pool broken, restarting", ERROR)
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.startPool()
+                future = self.pool.submit(generateJob, parameters, self.chunkWorkers)
+            job = Job(uuid.uuid4().hex, parameters, future)
+            self.jobs[job.getId()] = job
+            #Remove oldest finished jobs
+            if len(self.jobs) > self.maxJobs:
+                for jobId in [jobId for jobId, old in self.jobs.items() if old.isDone()][:len(self.jobs) - self.maxJobs]:
+                    del self.jobs[jobId]
+            return job
+
+    #Method to get a job
+    #In -> Job id
+    #Out -> Job (None if not found)
+    def getJob(self, jobId):
+        with self.lock:
+            return self.jobs.get(jobId)
+
+    #Method to stop the worker pool
+    #In -> Whether to wait for running jobs
+    #Out -> None
+    def shutdown(self, wait = True):
+        with self.lock:
+            if self.pool != None:
+                self.pool.shutdown(wait=wait, cancel_futures=True)
+                self.pool = None
@@ -0,0 +1,140 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonPdf.py
+#   Description -   Python file to handle exporting a Dungeon as a PDF (map and encounter list), built on the server.
+#                   The map is taken from the already rendered PNG: its compressed image data is copied into the PDF as it is
+#                   (PDF can read PNG-filtered data directly), so the map is not decoded or drawn again.
+#                   Encounters are written as text using the standard Helvetica font, so no font file is embedded.
+#
+#   Changelog   -   18/10/26    -   Created server-side PDF export
+
+import io
+import struct
+import zlib
+from dungeonImports import LazyModule
+
+#Heavy libraries are only imported when first used
+Image = LazyModule("PIL.Image")
+
+#Page layout (points, A4 portrait)
+pageWidth = 595
+pageHeight = 842
+pageMargin = 36
+titleSize = 18
+textSize = 11
+lineHeight = 15
+
+#Method to read the image data of a PNG so it can be copied into a PDF
+#In -> PNG bytes
+#Out -> Width, Height, Compressed image data, Whether the data is PNG-filtered (False if the image had to be decoded)
+def readPng(data):
+    width, height, depth, colourType, compression, filterMethod, interlace = struct.unpack(">IIBBBBB", data[16:29])
+    #Only 8 bit RGB, not interlaced, can be copied directly (all images drawn by dungeonRendering are)
+    if data[12:16] == b"IHDR" and depth == 8 and colourType == 2 and interlace == 0:
+        idat = []
+        position = 8
+        while position < len(data):
+            length, kind = struct.unpack(">I4s", data[position:position + 8])
+            if kind == b"IDAT":
+                idat.append(data[position + 8:position + 8 + length])
+            position += length + 12
+        return width, height, b"".join(idat), True
+    #Other images are decoded and compressed again
+    with Image.open(io.BytesIO(data)) as pic:
+        pixels = pic.convert("RGB")
+    return pixels.width, pixels.height, zlib.compress(pixels.tobytes()), False
+
+#Method to escape text for a PDF string
+#In -> Text
+#Out -> Escaped bytes (characters Helvetica cannot show are replaced with ?)
+def pdfString(text):
+    text = str(text).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + text.encode("cp1252", errors="replace") + b")"
+
+#Method to create the drawing commands for lines of text
+#In -> List of lines (text, size), Top of first line (points from bottom of page)
+#Out -> Content stream bytes
+def textCommands(lines, top):
+    commands = []
+    y = top
+    for text, size in lines:
+        y -= lineHeight if size == textSize else size + 6
+        commands.append(b"BT /F1 %d Tf %d %d Td " % (size, pageMargin, y) + pdfString(text) + b" Tj ET")
+    return b"\n".join(commands)
+
+#Method to create a PDF of a Dungeon
+#In -> Image (PNG bytes, None if the Dungeon has no image), List of encounters, Dungeon Seed, Population Seed, Party Size, Party average level
+#Out -> PDF bytes
+def createPdf(image, encounters, dunSeed, popSeed, partySize, partyLevel):
+    #Heading and seeds go at the top of the first page, above the map
+    heading = [("Your Dungeon", titleSize),
+               ("Dungeon Seed: {0:0=8d}    Population Seed: {1:0=4d}".format(int(dunSeed), int(popSeed)), textSize),
+               ("Recommended Party Size: {0}    Recommended Party Average Level: {1}".format(partySize, partyLevel), textSize)]
+    headingHeight = (titleSize + 6) + (lineHeight * 2) + lineHeight
+
+    #Encounter list, split into pages
+    lines = [("Room Information", titleSize)]
+    for encounter in encounters:
+        if encounter.getEnemy() != "":
+            lines.append(("Room {0}: {1} x {2}, Approximate XP: {3}".format(encounter.getRoom(), encounter.getNumber(), encounter.getEnemy(), encounter.getXP()), textSize))
+        else:
+            lines.append(("Room {0}: No Encounter".format(encounter.getRoom()), textSize))
+    linesPerPage = (pageHeight - (pageMargin * 2)) // lineHeight - 1
+
+    pages = []
+    top = pageHeight - pageMargin
+    first = textCommands(heading, top)
+    if image != None:
+        #Map is scaled to fit the rest of the first page (the image keeps its full resolution)
+        width, height, mapData, filtered = readPng(image)
+        areaWidth = pageWidth - (pageMargin * 2)
+        areaHeight = pageHeight - (pageMargin * 2) - headingHeight
+        scale = min(areaWidth / width, areaHeight / height)
+        drawWidth = width * scale
+        drawHeight = height * scale
+        x = pageMargin + ((areaWidth - drawWidth) / 2)
+        y = top - headingHeight - drawHeight
+        first += b"\nq %.2f 0 0 %.2f %.2f %.2f cm /Map Do Q" % (drawWidth, drawHeight, x, y)
+    else:
+        first += b"\n" + textCommands([("The map is too large to include -> Use the map viewer to see it.", textSize)], top - headingHeight)
+    pages.append(first)
+    for start in range(0, len(lines), linesPerPage):
+        pages.append(textCommands(lines[start:start + linesPerPage], top))
+
+    #Objects -> 1 Catalog, 2 Pages, 3 Font, 4 Map image, then a page and its content for each page
+    objects = [None] * 4
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    if image != None:
+        decode = b""
+        if filtered:
+            decode = b" /DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns %d >>" % width
+        objects[3] = (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode%s /Length %d >>\nstream\n"
+                      % (width, height, decode, len(mapData))) + mapData + b"\nendstream"
+    else:
+        objects[3] = b"null"
+    resources = b"/Font << /F1 3 0 R >>"
+    if image != None:
+        resources += b" /XObject << /Map 4 0 R >>"
+    kids = []
+    for content in pages:
+        pageNumber = len(objects) + 1
+        kids.append(b"%d 0 R" % pageNumber)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << %s >> /Contents %d 0 R >>"
+                       % (pageWidth, pageHeight, resources, pageNumber + 1))
+        content = zlib.compress(content)
+        objects.append(b"<< /Filter /FlateDecode /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(pages)
+
+    #Write objects, then the table of where each object starts
+    output = [b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"]
+    offsets = []
+    position = len(output[0])
+    for i in range(0, len(objects)):
+        part = b"%d 0 obj\n" % (i + 1) + objects[i] + b"\nendobj\n"
+        offsets.append(position)
+        output.append(part)
+        position += len(part)
+    output.append(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    output.extend(b"%010d 00000 n \n" % offset for offset in offsets)
+    output.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, position))
+    return b"".join(output)
@@ -11,10 +11,31 @@
 #                   26/01/2021  -   Added PopulationDensity variable
 #                   05/04/2021 -    Added code to sort rooms based on size, and set the difficulty of each rooms based on its size (small = easy, larger = harder)#
 #                   07/04/2021  -   Removed ability to populate dungeons with some enemy types where the number of enemies are few
+#                   18/10/2026  -   Loading and population phases are now timed by a PhaseTracer, and console output uses log levels
+#                   18/10/2026  -   Encounter is now slotted
+#                   18/10/2026  -   Population now draws from its own random generator instead of the global random
+#                   18/10/2026  -   Monster data is now found relative to this file rather than the current folder
+#                   18/10/2026  -   Monster data is now read once per process, from a compiled table which is only rebuilt when the JSON changes
+import hashlib
 import json
+import os
+import pickle
 import re
-import sys
 import random  
+import threading
+from dungeonCache import defaultCacheFolder
+from dungeonTracing import PhaseTracer, log, DEBUG, ERROR
+
+#Monster data file (found relative to this file so population works from any folder)
+monsterFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "srd_5e_monsters.json")
+#Compiled monster table, rebuilt when the hash of the monster data file changes
+#(Does not end in .pickle so it is not removed by the Dungeon disk cache)
+monsterTableFile = os.path.join(defaultCacheFolder, "srd_5e_monsters.table")
+#Version of compiled table -> Changing this rebuilds the table
+monsterTableVersion = 1
+#Whether the dictionaries have been filled (only done once per process, then shared read-only by every population)
+monstersLoaded = False
+monstersLock = threading.Lock()
 
 #Dictionaries of Monster Type
 beasts = {}
@@ -35,12 +56,9 @@ hardList = [75, 150, 225, 375, 750, 900, 1100, 1400, 1600, 1900, 2400, 3000, 340
 deadlyList = [100, 200, 400, 500, 1100, 1400, 1700, 2100, 2400, 2800, 3600, 4500, 5100, 5700, 6400, 7200, 8800, 9500, 10900, 12700]
 
 #Encounter class to handle enemy encounters
+#Slotted (no per-instance dictionary) as one is created for every room
 class Encounter:
-    roomIndex = None
-    enemyName = None
-    enemyNumber = None
-    approximateXp = None
-    
+    __slots__ = ("roomIndex", "enemyName", "enemyNumber", "approximateXp")
     
     #Constructor
     #In -> Room Index, Enemy Name, Number of enemies, XP to award
@@ -81,37 +99,89 @@ def stripText(crText):
     temp6 = int(temp5)
     return temp6
 
-#Method to Initialise Dictionaries of monster type from JSON Data
+#Method to read dictionaries of monster type from JSON Data
+#In -> Contents of monster data file
+#Out -> Dictionary of monster dictionaries by name (e.g "beasts"), each of monster name -> (XP, size)
+def compileMonsters(source):
+    tables = {"everything": {}, "beasts": {}, "humanoids": {}, "elementals": {}, "monstrosities": {}, "constructs": {}, "dragons": {}, "fiends": {}, "undead": {}}
+    data = json.loads(source)
+    for entry in data:
+        #Extract size of enemy
+        temp = entry['meta']
+        temp2 = re.search(r"^([\w\-]+)", temp)
+        size = temp2.group(1)
+        monster = stripText(entry['Challenge']), size
+    
+        #Check for each type of Monster
+        tables["everything"][entry['name']] = monster
+        #Beasts
+        if("beast" in entry['meta']):
+            tables["beasts"][entry['name']] = monster
+        elif("humanoid" in entry['meta']):
+            tables["humanoids"][entry['name']] = monster
+        elif("elemental" in entry['meta']):
+            tables["elementals"][entry['name']] = monster
+        elif("monstrosity" in entry['meta']):
+            tables["monstrosities"][entry['name']] = monster
+        elif("construct" in entry['meta']):
+            tables["constructs"][entry['name']] = monster
+        elif("dragon" in entry['meta']):
+            tables["dragons"][entry['name']] = monster
+        elif("fiend" in entry['meta']):
+            tables["fiends"][entry['name']] = monster
+        elif("undead" in entry['meta']):
+            tables["undead"][entry['name']] = monster
+    return tables
+
+#Method to load the compiled monster table, compiling it again if the monster data file has changed
+#In -> None
+#Out -> Dictionary of monster dictionaries (see compileMonsters)
+def loadMonsterTables():
+    with open(monsterFile, "rb") as f:
+        source = f.read()
+    sourceHash = hashlib.sha256(source).hexdigest()
+    try:
+        with open(monsterTableFile, "rb") as f:
+            version, tableHash, tables = pickle.load(f)
+        if version == monsterTableVersion and tableHash == sourceHash:
+            return tables
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+    
+    tables = compileMonsters(source)
+    try:
+        os.makedirs(os.path.dirname(monsterTableFile), exist_ok=True)
+        #Write to temporary file first so a partly written table is never read
+        temp = "{0}.{1}.tmp".format(monsterTableFile, os.getpid())
+        with open(temp, "wb") as f:
+            pickle.dump((monsterTableVersion, sourceHash, tables), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, monsterTableFile)
+    except OSError as e:
+        log("Unable to write monster table: {0}".format(e), ERROR)
+    return tables
+
+#Method to Initialise Dictionaries of monster type
+#Dictionaries are only filled the first time this is called, then shared (read-only) by every population
 #In -> None
 #Out -> None
 def initDictionaries():
-    with open ('srd_5e_monsters.json') as f:
-        data = json.load(f)
-        for entry in data:
-            #Extract size of enemy
-            temp = entry['meta']
-            temp2 = re.search(r"^([\w\-]+)", temp)
-            size = temp2.group(1)
-        
-            #Check for each type of Monster
-            everything[entry['name']] = stripText(entry['Challenge']), size
-            #Beasts
-            if("beast" in entry['meta']):
-                beasts[entry['name']] = stripText(entry['Challenge']), size
-            elif("humanoid" in entry['meta']):
-                humanoids[entry['name']] = stripText(entry['Challenge']), size
-            elif("elemental" in entry['meta']):
-                elementals[entry['name']] = stripText(entry['Challenge']), size
-            elif("monstrosity" in entry['meta']):
-                monstrosities[entry['name']] = stripText(entry['Challenge']), size
-            elif("construct" in entry['meta']):
-                constructs[entry['name']] = stripText(entry['Challenge']), size
-            elif("dragon" in entry['meta']):
-                dragons[entry['name']] = stripText(entry['Challenge']), size
-            elif("fiend" in entry['meta']):
-                fiends[entry['name']] = stripText(entry['Challenge']), size
-            elif("undead" in entry['meta']):
-                undead[entry['name']] = stripText(entry['Challenge']), size
+    global monstersLoaded
+    if monstersLoaded:
+        return
+    with monstersLock:
+        if monstersLoaded:
+            return
+        tables = loadMonsterTables()
+        everything.update(tables["everything"])
+        beasts.update(tables["beasts"])
+        humanoids.update(tables["humanoids"])
+        elementals.update(tables["elementals"])
+        monstrosities.update(tables["monstrosities"])
+        constructs.update(tables["constructs"])
+        dragons.update(tables["dragons"])
+        fiends.update(tables["fiends"])
+        undead.update(tables["undead"])
+        monstersLoaded = True
                 
 #Method to print Dictionary data to console (for testing)
 #In -> None
@@ -138,11 +208,11 @@ def determineDifficulty(PartySize, LevelAvg):
     return easyXp, mediumXp, hardXp, deadlyXp
 
 #Method to create a random encounter in the given room
-#In -> RoomIndex, MonsterDictionary, Target XP, Density, RoomSize
+#In -> RoomIndex, MonsterDictionary, Target XP, Density, RoomSize, random.Random to draw from (optional, global random used if not given)
 #Out -> Encounter 
-def createEncounter(Index, MonsterList, Target, Density, RoomSize):
+def createEncounter(Index, MonsterList, Target, Density, RoomSize, Rng = random):
     #Determine whether encounter is required via Density
-    chance = random.randint(1,100)
+    chance = Rng.randint(1,100)
     if chance <= Density:
         #Create encounter
     
@@ -200,22 +270,22 @@ def createEncounter(Index, MonsterList, Target, Density, RoomSize):
         #Now check if there is a valid list to take a monster from
         if selectableLists != []:
             #Select a random list
-            chosenList = random.choice(selectableLists)
+            chosenList = Rng.choice(selectableLists)
             number = None
             enemy = None
             #Now select a random enemy from the selected list
             if chosenList == "single":
                 number = 1
-                enemy = random.choice(singleMonster)
+                enemy = Rng.choice(singleMonster)
             elif chosenList == "double":
                 number = 2
-                enemy = random.choice(twoMonsters)
+                enemy = Rng.choice(twoMonsters)
             elif chosenList == "triple":
                 number = 3
-                enemy = random.choice(threeMonsters)
+                enemy = Rng.choice(threeMonsters)
             else:
                 number = 4
-                enemy = random.choice(fourMonsters)
+                enemy = Rng.choice(fourMonsters)
             
             #Now create encounter based on randomised enemy and number
             encounter = Encounter(Index, enemy, number, Target)
@@ -231,14 +301,21 @@ def createEncounter(Index, MonsterList, Target, Density, RoomSize):
         
         
 #Full method to populate a given dungeon grid with enemies
-#In -> Dungeon Rooms, Seed, Theme, Party size, Party average level, PopulationDensity
+#In -> Dungeon Rooms, Seed, Theme, Party size, Party average level, PopulationDensity, PhaseTracer (optional), random.Random to draw from (optional, created from Seed if not given)
 #Out -> List of encounters, Party Size, Party average level
-def populateDungeon(Rooms, Seed, Theme, PartySize, PartyAvg, PopDensity):
+def populateDungeon(Rooms, Seed, Theme, PartySize, PartyAvg, PopDensity, Tracer = None, Rng = None):
+    if Tracer == None:
+        Tracer = PhaseTracer()
+    #Random generator for this population only, so populations running at the same time do not affect each other
+    if Rng == None:
+        Rng = random.Random(int(Seed))
     encounters = []
     #Initialise Monster dictionaries
-    initDictionaries()
+    with Tracer.phase("monster loading") as event:
+        initDictionaries()
+        event.items = len(everything)
     #Determine which dictionary to use from Theme parameter
-    print(Theme)
+    log(Theme, DEBUG)
     monsterType = Theme
     if monsterType == "beasts":
         monsterDict = beasts
@@ -262,9 +339,9 @@ def populateDungeon(Rooms, Seed, Theme, PartySize, PartyAvg, PopDensity):
     #print(monsterDict)
     #Check if PartySize and PartyAvg are not given
     if PartySize == 0:
-        PartySize = random.randint(3,5)
+        PartySize = Rng.randint(3,5)
     if PartyAvg == 0:
-        PartyAvg = random.randint(1, 20)
+        PartyAvg = Rng.randint(1, 20)
     
     #Now determine XP Thresholds (Easy, Medium, Hard, Deadly)
     difficulties = determineDifficulty(PartySize, PartyAvg)
@@ -290,41 +367,43 @@ def populateDungeon(Rooms, Seed, Theme, PartySize, PartyAvg, PopDensity):
     sortedRooms = Rooms.copy()
     sortedRooms.sort(key=sortFunctionSize)
     
-    #Now go through each room and place encounter
-    for room in sortedRooms:
+    with Tracer.phase("population") as event:
+        #Now go through each room and place encounter
+        for room in sortedRooms:
     
-        if room != None:
+            if room != None:
         
-            #Determine difficulty of room based on position in sortedRooms list
-            #Ratio:         3:4:2:1     easy:medium:hard:deadly
-            targetXp = None
+                #Determine difficulty of room based on position in sortedRooms list
+                #Ratio:         3:4:2:1     easy:medium:hard:deadly
+                targetXp = None
             
-            roomInd = sortedRooms.index(room)
-            totalRooms = len(sortedRooms)
+                roomInd = sortedRooms.index(room)
+                totalRooms = len(sortedRooms)
             
-            calculation = roomInd / totalRooms
+                calculation = roomInd / totalRooms
             
-            if calculation <= 0.3:
-                targetXp = easyXp
-            elif calculation <= 0.7:
-                targetXp = mediumXp
-            elif calculation <= 0.9:
-                targetXp = hardXp
-            else:
-                targetXp = deadlyXp
+                if calculation <= 0.3:
+                    targetXp = easyXp
+                elif calculation <= 0.7:
+                    targetXp = mediumXp
+                elif calculation <= 0.9:
+                    targetXp = hardXp
+                else:
+                    targetXp = deadlyXp
             
-            #Get room size
-            size = room.size
+                #Get room size
+                size = room.size
             
-            #Get room index
-            ind = Rooms.index(room)
-            #Now generate encounter for room based on MonsterDictionary and Xp target
-            e = createEncounter(ind, monsterDict, targetXp, density, size)
-            encounters.append(e)
+                #Get room index
+                ind = Rooms.index(room)
+                #Now generate encounter for room based on MonsterDictionary and Xp target
+                e = createEncounter(ind, monsterDict, targetXp, density, size, Rng)
+                encounters.append(e)
+        event.items = len(encounters)
     
     encounters.sort(key=sortFunctionIndex)
     for encounter in encounters:
-        print(encounter)
+        log(encounter, DEBUG)
     return encounters, PartySize, PartyAvg
     
     
@@ -0,0 +1,177 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonRendering.py
+#   Description -   Python file to handle drawing of a Dungeon grid as an image.
+#                   Each grid value is used to index the tileset's stack of tiles, so the whole image is built in one step
+#                   rather than pasting each tile separately.
+#
+#   Changelog   -   18/10/26    -   Created vectorised renderer using tileset atlas
+#                               -   Pillow and NumPy are now imported on first use
+#                               -   Added map tiles (256px squares at any zoom level) so large Dungeons can be shown without drawing the whole image
+#                               -   Added streaming PNG encoder which draws and compresses the image a band of rows at a time
+
+import io
+import struct
+import zlib
+from dungeonImports import LazyModule
+from dungeonTilesets import getTileset, getFont, tileSize
+
+#Heavy libraries are only imported when first used
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+
+#Method to draw a grid of tile values using a tileset
+#In -> Grid (2D array indexed as grid[x][y]), Tileset name
+#Out -> RGB Image (grid x = image row, grid y = image column)
+def renderGrid(grid, tileset):
+    tiles = getTileset(tileset).getTiles()
+    grid = np.asarray(grid)
+    #Gather a tile for each cell -> (rows, columns, tileSize, tileSize, 3)
+    #Then interleave tile rows with grid rows to get the image
+    pixels = tiles[grid].transpose(0, 2, 1, 3, 4).reshape(grid.shape[0] * tileSize, grid.shape[1] * tileSize, 3)
+    return Image.fromarray(pixels, "RGB")
+
+#Method to draw a grid as an image with each room labelled with its room number
+#In -> Grid (2D array indexed as grid[x][y]), List of rooms, Tileset name
+#Out -> RGB Image
+def renderImage(grid, rooms, tileset):
+    pic = renderGrid(grid, tileset)
+    labelRooms(pic, rooms)
+    return pic
+
+#Method to encode an image as PNG
+#In -> Image
+#Out -> PNG bytes
+def encodePNG(pic):
+    buffer = io.BytesIO()
+    pic.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+#Method to label each room on an image with its room number
+#In -> Image, List of rooms, Position of image in the full size Dungeon image (pixels, for map tiles)
+#Out -> None (Draws onto image)
+def labelRooms(pic, rooms, offsetX = 0, offsetY = 0):
+    font = getFont()
+    d = ImageDraw.Draw(pic)
+    width, height = pic.size
+    for ind in range(0, len(rooms)):
+        room = rooms[ind]
+        posX = (room.getY() * tileSize) + (tileSize/5 * 2) - offsetX
+        posY = (room.getX() * tileSize) + (tileSize/5 * 2) - offsetY
+        #Skip labels that cannot reach the image
+        if posX < -labelMargin or posY < -labelMargin or posX > width or posY > height:
+            continue
+        d.text((posX, posY), str(ind + 1), (0,0,0), font=font)
+
+#Map tiles
+#Width and height of a map tile in pixels
+mapTileSize = 256
+#Largest distance (pixels) a room label can reach past its position
+labelMargin = 3 * tileSize
+
+#Method to get the number of zoom levels needed to show a grid as map tiles
+#At the highest zoom level one pixel of a map tile is one pixel of the full size image, and each level below halves the size
+#At zoom level 0 the whole Dungeon fits in one map tile
+#In -> Grid width, Grid height
+#Out -> Highest zoom level
+def getMaxZoom(width, height):
+    cells = max(width, height)
+    cellsPerMapTile = mapTileSize // tileSize
+    zoom = 0
+    while cellsPerMapTile * (2 ** zoom) < cells:
+        zoom += 1
+    return zoom
+
+#Method to shrink blocks of grid cells to one pixel each, averaging the colour of every cell in the block
+#In -> Grid section, Colour of each tile value (tile value, 3), Number of cells in each direction for each pixel
+#Out -> Array of pixels (rows, columns, 3)
+def averageCells(section, colours, factor):
+    rowStarts = np.arange(0, section.shape[0], factor)
+    columnStarts = np.arange(0, section.shape[1], factor)
+    #Sum colours of each block (blocks at the edge of the Dungeon may be smaller)
+    totals = np.add.reduceat(np.add.reduceat(colours[section], rowStarts, axis=0, dtype=np.uint32), columnStarts, axis=1)
+    rowCounts = np.diff(np.append(rowStarts, section.shape[0]))
+    columnCounts = np.diff(np.append(columnStarts, section.shape[1]))
+    counts = np.outer(rowCounts, columnCounts)[:, :, None]
+    return ((totals + (counts // 2)) // counts).astype(np.uint8)
+
+#Method to draw a single map tile of a grid
+#In -> Grid (2D array indexed as grid[x][y]), List of rooms, Tileset name, Zoom level, Map tile column, Map tile row
+#Out -> RGB Image (mapTileSize x mapTileSize), None if the map tile is outside the Dungeon
+def renderTile(grid, rooms, tileset, zoom, x, y):
+    grid = np.asarray(grid)
+    maxZoom = getMaxZoom(grid.shape[0], grid.shape[1])
+    if zoom < 0 or zoom > maxZoom or x < 0 or y < 0:
+        return None
+    #Number of grid cells shown in each direction by each pixel of the shrunk image (1 at the highest zoom level)
+    factor = 2 ** (maxZoom - zoom)
+    cells = (mapTileSize // tileSize) * factor
+    #Grid x is the image row, grid y is the image column
+    rowStart = y * cells
+    columnStart = x * cells
+    if rowStart >= grid.shape[0] or columnStart >= grid.shape[1]:
+        return None
+    section = grid[rowStart:rowStart + cells, columnStart:columnStart + cells]
+    
+    atlas = getTileset(tileset)
+    if factor <= tileSize:
+        #Each cell is still at least one pixel -> Draw with shrunk tiles
+        tiles = atlas.getScaledTiles(factor)
+        size = tileSize // factor
+        pixels = tiles[section].transpose(0, 2, 1, 3, 4).reshape(section.shape[0] * size, section.shape[1] * size, 3)
+    else:
+        #Several cells to each pixel -> Mix the colour of each cell (a one pixel tile)
+        colours = atlas.getScaledTiles(tileSize)[:, 0, 0, :]
+        pixels = averageCells(section, colours, factor // tileSize)
+    
+    #Map tiles at the edge of the Dungeon are filled with black
+    pic = Image.new("RGB", (mapTileSize, mapTileSize))
+    pic.paste(Image.fromarray(np.ascontiguousarray(pixels), "RGB"), (0, 0))
+    #Room numbers are only readable at the highest zoom level
+    if factor == 1:
+        labelRooms(pic, rooms, columnStart * tileSize, rowStart * tileSize)
+    return pic
+
+#Streamed images
+#Number of grid rows drawn and compressed at a time
+streamBandRows = 16
+#Bytes every PNG file starts with
+pngSignature = b"\x89PNG\r\n\x1a\n"
+
+#Method to create a PNG chunk
+#In -> Chunk type (4 bytes, e.g b"IDAT"), Chunk data
+#Out -> Chunk bytes (length, type, data, CRC)
+def pngChunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+#Method to draw a grid as a PNG image, one band of rows at a time
+#Each band is drawn, labelled and compressed before the next is started, so only one band of the image is held in memory
+#and the first bytes can be sent before the rest of the image is drawn
+#In -> Grid (2D array indexed as grid[x][y]), List of rooms, Tileset name, Number of grid rows in each band
+#Out -> Generator of PNG bytes (same pixels as renderGrid and labelRooms)
+def streamImage(grid, rooms, tileset, bandRows = streamBandRows):
+    tiles = getTileset(tileset).getTiles()
+    grid = np.asarray(grid)
+    width = grid.shape[1] * tileSize
+    height = grid.shape[0] * tileSize
+    yield pngSignature
+    #8 bit RGB, not interlaced
+    yield pngChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    
+    #One zlib stream for the whole image, flushed at the end of each band so the band can be sent
+    compressor = zlib.compressobj()
+    previous = np.zeros((1, width * 3), dtype=np.uint8)
+    for start in range(0, grid.shape[0], bandRows):
+        band = grid[start:start + bandRows]
+        pixels = tiles[band].transpose(0, 2, 1, 3, 4).reshape(band.shape[0] * tileSize, width, 3)
+        pic = Image.fromarray(pixels, "RGB")
+        labelRooms(pic, rooms, 0, start * tileSize)
+        rows = np.asarray(pic).reshape(-1, width * 3)
+        #Each row is stored as its difference from the row above (PNG "Up" filter), as tiles repeat down the image
+        scanlines = np.empty((rows.shape[0], (width * 3) + 1), dtype=np.uint8)
+        scanlines[:, 0] = 2
+        scanlines[:, 1:] = rows - np.concatenate((previous, rows[:-1]))
+        previous = rows[-1:]
+        yield pngChunk(b"IDAT", compressor.compress(scanlines.tobytes()) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    yield pngChunk(b"IDAT", compressor.flush())
+    yield pngChunk(b"IEND", b"")
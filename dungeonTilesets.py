@@ -0,0 +1,166 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonTilesets.py
+#   Description -   Python file to handle loading of the Tilesets used to draw Dungeon images.
+#                   Each tileset folder (sprites/<Tileset>Tiles/) is decoded once into a TileAtlas which is reused for every image,
+#                   and is only reloaded when the folder is modified.
+#
+#   Changelog   -   18/10/26    -   Created Tileset registry to cache sprites and font between images
+#                               -   Pillow and NumPy are now imported on first use
+#                               -   Tilesets can now give shrunk tiles for zoomed out map tiles
+
+import os
+from dungeonImports import LazyModule
+from dungeonTracing import log, ERROR
+
+#Heavy libraries are only imported when first used
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+ImageFont = LazyModule("PIL.ImageFont")
+
+#Folder holding tileset folders, and font used to label rooms
+spriteFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sprites")
+fontFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "times-ro.ttf")
+
+#Dimensions of a single tile
+tileSize = 16
+
+#Sprite used for each tile value (index = tile value in Grid)
+#Tile 25 (Undefined corridor) has no sprite and is left black
+tileRoles = [
+    "Blank",                            #0 = None
+    "Tile",                             #1 = Normal
+    "Left",                             #2 = Left
+    "Right",                            #3 = Right
+    "Bottom",                           #4 = Bottom
+    "Top",                              #5 = Top
+    "TopLeft",                          #6 = TopLeft
+    "TopRight",                         #7 = TopRight
+    "BottomLeft",                       #8 = BottomLeft
+    "BottomRight",                      #9 = BottomRight
+    "CorridorSingleVertical",           #10 = Single Vertical
+    "CorridorSingleHorizontal",         #11 = Single Horizontal
+    "CorridorDoubleVerticalLeft",       #12 = Double Vertical Left
+    "CorridorDoubleVerticalRight",      #13 = Double Vertical Right
+    "CorridorDoubleHorizontalTop",      #14 = Double Horizontal Top
+    "CorridorDoubleHorizontalBottom",   #15 = Double Horizontal Bottom
+    "CorridorTopLeftCorner",            #16 = Top Left Corner
+    "CorridorTopRightCorner",           #17 = Top Right Corner
+    "CorridorBottomLeftCorner",         #18 = Bottom Left Corner
+    "CorridorBottomRightCorner",        #19 = Bottom Right Corner
+    "CorridorCrossroad",                #20 = Crossroads
+    "CorridorNotLeft",                  #21 = Not Left
+    "CorridorNotRight",                 #22 = Not Right
+    "CorridorNotUp",                    #23 = Not Up
+    "CorridorNotDown"                   #24 = Not Down
+]
+
+#Loaded tilesets by name
+tilesets = {}
+#Font used to label rooms (loaded on first use)
+font = None
+
+#TileAtlas class
+#Holds every sprite of a tileset decoded in memory
+class TileAtlas:
+    name = None
+    path = None
+    modified = None
+    images = None
+    tiles = None
+    scaledTiles = None
+
+    #Constructor
+    #In -> Tileset name, Path to tileset folder
+    def __init__(self, Name, Path):
+        self.name = Name
+        self.path = Path
+        self.modified = os.stat(self.path).st_mtime
+        self.images = []
+        self.scaledTiles = {}
+        #Stack of tiles (one per tile value, plus black undefined tile)
+        self.tiles = np.zeros((len(tileRoles) + 1, tileSize, tileSize, 3), dtype=np.uint8)
+        for i in range(0, len(tileRoles)):
+            with Image.open(os.path.join(self.path, tileRoles[i] + ".png")) as sprite:
+                image = sprite.convert("RGB")
+            self.images.append(image)
+            self.tiles[i] = np.asarray(image)
+
+    #Getter methods
+    def getImages(self):
+        return self.images
+
+    def getTiles(self):
+        return self.tiles
+
+    #Method to get the stack of tiles shrunk by a factor, for drawing zoomed out images
+    #Each pixel is the average of the block of pixels it replaces, so every factor matches shrinking the full size image
+    #In -> Factor (power of 2, up to tileSize)
+    #Out -> Stack of tiles (tile value, tileSize / factor, tileSize / factor, 3)
+    def getScaledTiles(self, factor):
+        if factor == 1:
+            return self.tiles
+        scaled = self.scaledTiles.get(factor)
+        if scaled is None:
+            size = tileSize // factor
+            blocks = self.tiles.reshape(len(self.tiles), size, factor, size, factor, 3)
+            scaled = np.rint(blocks.mean(axis=(2, 4))).astype(np.uint8)
+            self.scaledTiles[factor] = scaled
+        return scaled
+
+    #Method to check whether the tileset folder has changed since it was loaded
+    #In -> None
+    #Out -> Boolean of whether tileset needs reloading
+    def isStale(self):
+        return os.stat(self.path).st_mtime != self.modified
+
+#Method to find every tileset folder with all of the required sprites
+#In -> None
+#Out -> Dictionary of tileset name to folder path
+def discoverTilesets():
+    found = {}
+    for folder in sorted(os.listdir(spriteFolder)):
+        path = os.path.join(spriteFolder, folder)
+        if not folder.endswith("Tiles") or not os.path.isdir(path):
+            continue
+        #Check all tile roles exist
+        files = set(os.listdir(path))
+        missing = [role for role in tileRoles if role + ".png" not in files]
+        if missing != []:
+            log("Tileset {0} is missing sprites: {1}".format(folder, ", ".join(missing)), ERROR)
+            continue
+        found[folder[:-len("Tiles")]] = path
+    return found
+
+#Method to get the names of every valid tileset
+#In -> None
+#Out -> List of tileset names
+def getTilesetNames():
+    return list(discoverTilesets().keys())
+
+#Method to get the atlas for a tileset, loading it if it is new or has changed
+#In -> Tileset name
+#Out -> TileAtlas
+def getTileset(name):
+    atlas = tilesets.get(name)
+    if atlas == None or atlas.isStale():
+        path = discoverTilesets().get(name)
+        if path == None:
+            raise ValueError("Unknown tileset: {0}".format(name))
+        atlas = TileAtlas(name, path)
+        tilesets[name] = atlas
+    return atlas
+
+#Method to remove every loaded tileset so they are reloaded on next use
+#In -> None
+#Out -> None
+def reloadTilesets():
+    tilesets.clear()
+
+#Method to get the font used to label rooms
+#In -> None
+#Out -> Font
+def getFont():
+    global font
+    if font == None:
+        font = ImageFont.truetype(fontFile, 12)
+    return font
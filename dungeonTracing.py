@@ -0,0 +1,117 @@
+#   Author      -   Jack Manning
+#   Name        -   dungeonTracing.py
+#   Description -   Python file to handle diagnostics for Dungeon generation and population.
+#                   Each phase of the pipeline is timed by a PhaseTracer, which passes an event to an optional hook and builds a timing report.
+#                   Console messages go through log() so they can be turned down or off by level.
+#
+#   Changelog   -   18/10/26    -   Created phase tracing and console log levels
+
+import sys
+import time
+
+#Console log levels
+ERROR = 0
+INFO = 1
+DEBUG = 2
+
+#Current console log level -> Messages above this level are not printed
+logLevel = INFO
+
+#Method to set the console log level
+#In -> Log level (ERROR, INFO or DEBUG)
+#Out -> None
+def setLogLevel(level):
+    global logLevel
+    logLevel = level
+
+#Method to print a message to console if its level is enabled
+#In -> Message, Log level
+#Out -> None
+def log(message, level = INFO):
+    if level <= logLevel:
+        print(message)
+
+#PhaseEvent class
+#Information about a single run of a phase
+class PhaseEvent:
+    name = None
+    seconds = None
+    netBlocks = None
+    items = None
+
+    #Constructor
+    #In -> Phase name
+    def __init__(self, Name):
+        self.name = Name
+        self.seconds = 0.0
+        self.netBlocks = 0
+        self.items = 0
+
+    #ToString
+    def __str__(self):
+        return "{0}: {1:.3f}ms, {2} net blocks, {3} items".format(self.name, self.seconds * 1000, self.netBlocks, self.items)
+
+#PhaseTimer class
+#Context manager used by PhaseTracer to time a phase
+class PhaseTimer:
+    tracer = None
+    event = None
+    startTime = None
+    startBlocks = None
+
+    def __init__(self, Tracer, Name):
+        self.tracer = Tracer
+        self.event = PhaseEvent(Name)
+
+    def __enter__(self):
+        self.startBlocks = sys.getallocatedblocks()
+        self.startTime = time.perf_counter()
+        return self.event
+
+    def __exit__(self, excType, excValue, traceback):
+        self.event.seconds = time.perf_counter() - self.startTime
+        #Net change in allocated memory blocks during the phase (not a count of allocations -> 0 or negative if the phase frees as much as it allocates)
+        self.event.netBlocks = sys.getallocatedblocks() - self.startBlocks
+        self.tracer.record(self.event)
+        return False
+
+#PhaseTracer class
+#Records events for each phase of generation
+#Phases which run more than once (e.g room creation for each leaf) are added together in the report
+class PhaseTracer:
+    hook = None
+    report = None
+
+    #Constructor
+    #In -> Hook (function called with each PhaseEvent, or None)
+    def __init__(self, Hook = None):
+        self.hook = Hook
+        self.report = {}
+
+    #Method to time a phase
+    #Use as: with tracer.phase("name") as event: ... event.items = count
+    #In -> Phase name
+    #Out -> PhaseTimer
+    def phase(self, name):
+        return PhaseTimer(self, name)
+
+    #Method to add a finished event to the report and pass it to the hook
+    #In -> PhaseEvent
+    #Out -> None
+    def record(self, event):
+        entry = self.report.get(event.name)
+        if entry == None:
+            entry = {"seconds": 0.0, "netBlocks": 0, "items": 0, "calls": 0}
+            self.report[event.name] = entry
+        entry["seconds"] += event.seconds
+        entry["netBlocks"] += event.netBlocks
+        entry["items"] += event.items
+        entry["calls"] += 1
+        log(event, DEBUG)
+        if self.hook != None:
+            self.hook(event)
+
+    #Getter method
+    #Out -> Dictionary of phase name to seconds, net blocks, items and calls (in the order phases first ran)
+    def getReport(self):
+        return self.report
@@ -1,8 +1,18 @@
-from flask import Flask, render_template, flash, request
-from wtforms import Form, IntegerField, validators, SubmitField, SelectField
-import pdfkit
+from flask import Flask, Response, render_template, request, send_file, abort, url_for, jsonify, session, redirect
+from wtforms import Form, IntegerField, validators, SelectField
+from collections import OrderedDict
+from dungeonCache import MemoryCache, CachedImage
+from dungeonExport import dungeonData, gridEncodings
+from dungeonJobs import JobQueue, defaultChunkWorkers
+from dungeonPdf import createPdf
+from dungeonRendering import renderTile, getMaxZoom, mapTileSize, streamImage
+from dungeonTilesets import tileSize, getTilesetNames
+from concurrent import futures
 import dungeonGeneration
-import copy
+import base64
+import io
+import threading
+import uuid
 
 DEBUG = True
 app = Flask(__name__)
@@ -10,7 +20,216 @@ app.config.from_object(__name__)
 app.config['SECRET_KEY'] = '7d441f27d441f27567d441f2b6176a'
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
-latestImage = 'static/latestDungeon.PNG'
+#Generated dungeons kept in memory by dungeon id (oldest removed first)
+storedDungeons = OrderedDict()
+storedDungeonsLock = threading.Lock()
+maxStoredDungeons = 100
+
+#Largest dungeon (number of grid cells) whose full image is drawn when it was too large to keep as one image
+#(Matches the largest custom size, so every dungeon has a full image)
+maxStreamedCells = dungeonGeneration.maximumCustomSize * dungeonGeneration.maximumCustomSize
+
+#Dungeons are created in the background by a pool of worker processes, so requests are not held up by generation
+#Each job can use more processes to create the chunks of custom sized dungeons
+chunkWorkers = defaultChunkWorkers
+jobQueue = JobQueue(ChunkWorkers = chunkWorkers)
+#Longest time (seconds) a request can wait for a job to finish
+maxJobWait = 30
+
+#Largest dungeon (number of grid cells) the JSON API creates while the request waits -> Larger dungeons are sent to the job queue
+maxApiCells = dungeonGeneration.maximumImageTiles
+
+#Map tiles drawn for the dungeon viewer, kept by layout id and position (least recently used removed first)
+tileCache = MemoryCache(32 * 1024 * 1024)
+
+#Parameters which decide the layout of a dungeon (with its seed)
+layoutParameters = ["size", "shape", "corridor", "tileset", "roomSizing", "corridorSteps"]
+
+#StoredDungeon class
+#A generated dungeon and its population, as shown on a dungeon page
+#Repopulating a dungeon stores the same layout again with new encounters, so both share the layout id (used to share map tiles)
+#The PDF export is made the first time it is requested, then kept with the dungeon
+class StoredDungeon:
+    dungeon = None
+    layout = None
+    layoutId = None
+    encounters = None
+    dungeonSeed = None
+    populationSeed = None
+    partySize = None
+    partyLevel = None
+    pdf = None
+    lock = None
+
+    #Constructor
+    #In -> CachedDungeon (grid, rooms, corridors and image), Layout parameters (dictionary of layoutParameters), List of encounters,
+    #      Dungeon Seed, Population Seed, Party Size, Party average level, Layout id (None for a new layout -> Set to its dungeon id when stored)
+    def __init__(self, Dungeon, Layout, Encounters, DungeonSeed, PopulationSeed, PartySize, PartyLevel, LayoutId = None):
+        self.dungeon = Dungeon
+        self.layout = {name: Layout[name] for name in layoutParameters}
+        self.layoutId = LayoutId
+        self.encounters = Encounters
+        self.dungeonSeed = DungeonSeed
+        self.populationSeed = PopulationSeed
+        self.partySize = PartySize
+        self.partyLevel = PartyLevel
+        self.lock = threading.Lock()
+
+    #Getter methods
+    def getDungeon(self):
+        return self.dungeon
+
+    def getLayout(self):
+        return self.layout
+
+    def getLayoutId(self):
+        return self.layoutId
+
+    def getTileset(self):
+        return self.layout["tileset"]
+
+    def getEncounters(self):
+        return self.encounters
+
+    def getDungeonSeed(self):
+        return self.dungeonSeed
+
+    def getPopulationSeed(self):
+        return self.populationSeed
+
+    def getPartySize(self):
+        return self.partySize
+
+    def getPartyLevel(self):
+        return self.partyLevel
+
+    #Method to get the PDF export, creating it on first use
+    #In -> None
+    #Out -> PDF bytes
+    def getPdf(self):
+        with self.lock:
+            if self.pdf == None:
+                self.pdf = createPdf(self.dungeon.getImage(), self.encounters, self.dungeonSeed, self.populationSeed, self.partySize, self.partyLevel)
+            return self.pdf
+
+#Method to store a generated dungeon in memory
+#In -> StoredDungeon
+#Out -> Dungeon id used to request the image, map tiles and PDF
+def storeDungeon(stored):
+    dungeonId = uuid.uuid4().hex
+    if stored.layoutId == None:
+        stored.layoutId = dungeonId
+    with storedDungeonsLock:
+        storedDungeons[dungeonId] = stored
+        while len(storedDungeons) > maxStoredDungeons:
+            storedDungeons.popitem(last=False)
+    return dungeonId
+
+#Method to get a stored dungeon
+#In -> Dungeon id
+#Out -> StoredDungeon (None if not stored)
+def getStoredDungeon(dungeonId):
+    with storedDungeonsLock:
+        return storedDungeons.get(dungeonId)
+
+#Method to get the dungeon last shown to this session
+#In -> None
+#Out -> StoredDungeon (None if this session has no dungeon, or it is no longer stored in this process -> See session["layout"])
+def getSessionDungeon():
+    return getStoredDungeon(session.get("dungeonId"))
+
+#Method to show the dungeon page, and remember the dungeon for this session (so it can be repopulated)
+#In -> Dungeon id
+#Out -> Rendered page
+def showDungeon(dungeonId):
+    stored = getStoredDungeon(dungeonId)
+    session["dungeonId"] = dungeonId
+    session["layout"] = dict(stored.getLayout(), seed = int(stored.getDungeonSeed()))
+    dungeon = stored.getDungeon()
+    rows, columns = dungeon.getGrid().shape
+    #Full image is only linked if it is kept, or small enough to stream
+    userImage = None
+    if dungeon.getImage() != None or rows * columns <= maxStreamedCells:
+        userImage = url_for('dungeonImage', dungeonId = dungeonId)
+    tileUrl = url_for('dungeonTile', dungeonId = dungeonId, zoom = 0, x = 0, y = 0).replace("/0/0/0.png", "/{z}/{x}/{y}.png")
+    return render_template('dungeon.html', user_image = userImage, tile_url = tileUrl, tile_size = mapTileSize,
+                           map_width = columns * tileSize, map_height = rows * tileSize, max_zoom = getMaxZoom(rows, columns),
+                           pdf_url = url_for('dungeonPdf', dungeonId = dungeonId), data = stored.getEncounters(),
+                           dunSeed = "{0:0=8d}".format(stored.getDungeonSeed()), popSeed = "{0:0=4d}".format(stored.getPopulationSeed()),
+                           partySize = stored.getPartySize(), partyLevel = stored.getPartyLevel())
+
+#Method to get the status of a job
+#In -> Job
+#Out -> Dictionary of job status (for JSON)
+def jobStatus(job):
+    data = {
+        "id": job.getId(),
+        "status": job.getStatus(),
+        "statusUrl": url_for('jobStatusPage', jobId = job.getId()),
+        "resultUrl": url_for('jobResult', jobId = job.getId()),
+    }
+    if data["status"] == "failed":
+        data["error"] = job.getError()
+    return data
+
+#JSON API parameters, and the default for each
+apiDefaults = {
+    "size": "2",
+    "shape": "Square",
+    "corridor": "BSP",
+    "seed": 0,
+    "popSeed": 0,
+    "theme": "everything",
+    "partySize": 0,
+    "partyLevel": 0,
+    "density": "normal",
+    "tileset": "Stone",
+    "roomSizing": "batch",
+    "corridorSteps": "batch",
+    "encoding": "rle",
+    "image": False,
+}
+
+#Method to read and check JSON API parameters
+#In -> Given parameters (dictionary)
+#Out -> Dictionary of every parameter (raises ValueError if a parameter is not valid)
+def readApiParameters(given):
+    unknown = set(given) - set(apiDefaults)
+    if unknown != set():
+        raise ValueError("Unknown parameters: {0}".format(", ".join(sorted(unknown))))
+    parameters = dict(apiDefaults)
+    parameters.update(given)
+    for name in ["seed", "popSeed", "partySize", "partyLevel"]:
+        parameters[name] = int(parameters[name])
+    parameters["size"] = str(parameters["size"])
+    if parameters["size"] not in ["1", "2", "3", "4"] and dungeonGeneration.parseDimensions(parameters["size"])[0] == None:
+        raise ValueError("size must be 1-4 or WIDTHxHEIGHT")
+    if parameters["shape"] not in ["Square", "Rectangle"]:
+        raise ValueError("shape must be Square or Rectangle")
+    if parameters["corridor"] not in ["BSP", "Drunkard"]:
+        raise ValueError("corridor must be BSP or Drunkard")
+    if parameters["roomSizing"] not in ["batch", "legacy"]:
+        raise ValueError("roomSizing must be batch or legacy")
+    if parameters["corridorSteps"] not in ["batch", "legacy"]:
+        raise ValueError("corridorSteps must be batch or legacy")
+    if parameters["encoding"] not in gridEncodings:
+        raise ValueError("encoding must be one of {0}".format(", ".join(gridEncodings)))
+    if parameters["tileset"] not in getTilesetNames():
+        raise ValueError("Unknown tileset {0}".format(parameters["tileset"]))
+    parameters["image"] = str(parameters["image"]).lower() in ["1", "true", "yes"]
+    return parameters
+
+#Method to create the JSON API result for a dungeon
+#In -> CachedDungeon, Dungeon Seed, List of encounters, Population Seed, Party Size, Party average level, Parameters (see readApiParameters)
+#Out -> Dictionary of dungeon data (for JSON)
+def apiData(dungeon, dunSeed, enc, popSeed, partySize, partyLevel, parameters):
+    data = {"dungeonSeed": int(dunSeed), "populationSeed": int(popSeed), "partySize": partySize, "partyLevel": partyLevel}
+    data.update(dungeonData(dungeon, enc, parameters["encoding"]))
+    if parameters["image"]:
+        #Dungeons too large to draw as one image have no image (use the map tiles instead)
+        image = dungeon.getImage()
+        data["image"] = None if image == None else base64.b64encode(image).decode("ascii")
+    return data
 
 class ReusableForm(Form):
     size = SelectField(u'Size', choices=[('Tiny'), ('Small'), ('Medium'), ('Large')])
@@ -36,19 +255,15 @@ def home():
     form = ReusableForm(request.form)
     
     if request.method == 'POST':
-        global size
         size = request.form['Size']
         print("Size: {0}".format(size))#
         
-        global shape
         shape = request.form['Shape']
         print("Shape: {0}".format(shape))
         
-        global corridorAlgorithm
         corridorAlgorithm = request.form['CorridorAlgorithm']
         print("Corridor Algorithm: {0}".format(corridorAlgorithm))
         
-        global Seed
         Seed = int(request.form['Seed'])
         if Seed == 0:
             print("No Dungeon Seed")
@@ -79,15 +294,20 @@ def home():
         density = request.form['Density']
         print("Density: {0}".format(density))
         
-        global tileset
         tileset = request.form['Tileset']
         print("Tileset: {0}".format(tileset))
         print(Seed)
-        enc, seed1, seed2 , partySize, partyLevel= dungeonGeneration.main(size, shape, corridorAlgorithm, Seed, PopSeed, theme, partySize, partyLevel, density, tileset)
-        DungeonSeed = "{0:0=8d}".format(seed1)
-        PopulationSeed = "{0:0=4d}".format(seed2)
-        Seed = seed1
-        return render_template('dungeon.html', user_image = latestImage, data = enc, dunSeed = DungeonSeed, popSeed = PopulationSeed, partySize = partySize, partyLevel = partyLevel)
+        try:
+            parameters = readApiParameters({"size": size, "shape": shape, "corridor": corridorAlgorithm, "seed": Seed, "popSeed": PopSeed, "theme": theme,
+                                            "partySize": partySize, "partyLevel": partyLevel, "density": density, "tileset": tileset})
+        except ValueError as e:
+            abort(400, str(e))
+        #Create dungeon in the background -> Page waits for the job, then shows its result
+        job = jobQueue.submit(parameters)
+        if job == None:
+            abort(503, "Too many dungeons are being created, try again shortly")
+        status = jobStatus(job)
+        return render_template('job.html', status_url = status["statusUrl"], result_url = status["resultUrl"], max_wait = maxJobWait)
     return render_template('home.html', form=form)
 
 #Repopulate function  
@@ -113,14 +333,162 @@ def repopulate():
         
         density = request.form['Density']
         print("Density: {0}".format(density))
-        print(Seed)
+        #Only the population changes -> Rooms of this session's dungeon are populated again, the layout and image are reused
+        stored = getSessionDungeon()
+        if stored == None:
+            #Dungeon is no longer stored in this process (e.g removed, or the request went to another server process)
+            #-> Created again in the background from the layout kept in the session, normally found in the dungeon cache
+            layout = session.get("layout")
+            if layout == None:
+                return redirect(url_for('home'))
+            try:
+                #Sessions from older versions may not have every layout parameter -> Defaults are used
+                parameters = readApiParameters(dict(layout, popSeed = 0, theme = theme, partySize = partySize, partyLevel = partyLevel, density = density))
+            except (TypeError, ValueError):
+                #Layout can not be used -> Forgotten, so the next dungeon starts from the home page
+                session.pop("layout", None)
+                return redirect(url_for('home'))
+            job = jobQueue.submit(parameters)
+            if job == None:
+                abort(503, "Too many dungeons are being created, try again shortly")
+            #Layout is forgotten if the job fails (see forgetFailedLayout)
+            job.getData()["sessionLayout"] = True
+            status = jobStatus(job)
+            return render_template('job.html', status_url = status["statusUrl"], result_url = status["resultUrl"], max_wait = maxJobWait)
+        print(stored.getDungeonSeed())
         PopSeed = 0
-        enc, seed1, seed2, partySize, partyLevel= dungeonGeneration.main(size, shape, corridorAlgorithm, Seed, PopSeed, theme, partySize, partyLevel, density, tileset)
-        DungeonSeed = "{0:0=8d}".format(seed1)
-        PopulationSeed = "{0:0=4d}".format(seed2)
-        return render_template('dungeon.html', user_image = latestImage, data = enc, dunSeed = DungeonSeed, popSeed = PopulationSeed, partySize = partySize, partyLevel = partyLevel)
+        enc, seed2, partySize, partyLevel = dungeonGeneration.populateRooms(stored.getDungeon().getRooms(), PopSeed, theme, partySize, partyLevel, density)
+        return showDungeon(storeDungeon(StoredDungeon(stored.getDungeon(), stored.getLayout(), enc, stored.getDungeonSeed(), seed2, partySize, partyLevel, stored.getLayoutId())))
     return render_template('home.html', form=form)
     
+#Add a job to create a dungeon in the background
+#Parameters are the same as the JSON API, given in the query string, a form, or a JSON body
+@app.route("/jobs", methods=['POST'])
+def submitJob():
+    given = request.get_json(silent=True) if request.is_json else request.values.to_dict()
+    try:
+        parameters = readApiParameters(given or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    job = jobQueue.submit(parameters)
+    if job == None:
+        return jsonify({"error": "Too many dungeons are being created, try again shortly"}), 503, {"Retry-After": "5"}
+    status = jobStatus(job)
+    return jsonify(status), 202, {"Location": status["statusUrl"]}
+
+#Method to forget the layout kept in the session if the job creating it again has failed (so repopulating starts from the home page)
+#In -> Job
+#Out -> None
+def forgetFailedLayout(job):
+    if job.getData().get("sessionLayout") and job.getStatus() == "failed":
+        session.pop("layout", None)
+
+#Status of a job
+@app.route("/jobs/<jobId>", methods=['GET'])
+def jobStatusPage(jobId):
+    job = jobQueue.getJob(jobId)
+    if job == None:
+        abort(404)
+    forgetFailedLayout(job)
+    return jsonify(jobStatus(job))
+
+#Result of a job -> Dungeon page (or JSON with format=json), waiting up to "wait" seconds for the job to finish
+#Returns the job status (202) if it has not finished in time
+@app.route("/jobs/<jobId>/result", methods=['GET'])
+def jobResult(jobId):
+    job = jobQueue.getJob(jobId)
+    if job == None:
+        abort(404)
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0), maxJobWait)
+    except ValueError:
+        abort(400)
+    try:
+        dungeon, dunSeed, enc, popSeed, partySize, partyLevel = job.getResult(wait)
+    except futures.TimeoutError:
+        return jsonify(jobStatus(job)), 202
+    except Exception:
+        forgetFailedLayout(job)
+        return jsonify(jobStatus(job)), 500
+    
+    if request.args.get("format") == "json":
+        return jsonify(apiData(dungeon, dunSeed, enc, popSeed, partySize, partyLevel, job.getParameters()))
+    #Dungeon is stored the first time its page is shown (and again if it has since been removed)
+    dungeonId = job.getData().get("dungeonId")
+    if dungeonId == None or getStoredDungeon(dungeonId) == None:
+        dungeonId = storeDungeon(StoredDungeon(dungeon, job.getParameters(), enc, dunSeed, popSeed, partySize, partyLevel))
+        job.getData()["dungeonId"] = dungeonId
+    return showDungeon(dungeonId)
+
+#Dungeon image (served from memory, or drawn and sent a band at a time for dungeons too large to keep as one image)
+@app.route("/dungeon/<dungeonId>.png", methods=['GET'])
+def dungeonImage(dungeonId):
+    stored = getStoredDungeon(dungeonId)
+    if stored == None:
+        abort(404)
+    dungeon = stored.getDungeon()
+    if dungeon.getImage() != None:
+        return send_file(io.BytesIO(dungeon.getImage()), mimetype='image/png')
+    if dungeon.getGrid().size > maxStreamedCells:
+        abort(404)
+    return Response(streamImage(dungeon.getGrid(), dungeon.getRooms(), stored.getTileset()), mimetype='image/png')
+
+#Dungeon PDF export (map and encounters, made on first request then kept with the dungeon)
+@app.route("/dungeon/<dungeonId>.pdf", methods=['GET'])
+def dungeonPdf(dungeonId):
+    stored = getStoredDungeon(dungeonId)
+    if stored == None:
+        abort(404)
+    return send_file(io.BytesIO(stored.getPdf()), mimetype='application/pdf', as_attachment=True, download_name='Dungeon.pdf')
+
+#Dungeon map tile (drawn when first requested, then served from the tile cache)
+@app.route("/dungeon/<dungeonId>/tiles/<int:zoom>/<int:x>/<int:y>.png", methods=['GET'])
+def dungeonTile(dungeonId, zoom, x, y):
+    stored = getStoredDungeon(dungeonId)
+    if stored == None:
+        abort(404)
+    #Repopulated dungeons share the tiles of their layout
+    key = (stored.getLayoutId(), zoom, x, y)
+    tile = tileCache.get(key)
+    if tile == None:
+        dungeon = stored.getDungeon()
+        pic = renderTile(dungeon.getGrid(), dungeon.getRooms(), stored.getTileset(), zoom, x, y)
+        if pic == None:
+            abort(404)
+        buffer = io.BytesIO()
+        pic.save(buffer, 'PNG')
+        tile = CachedImage(buffer.getvalue())
+        tileCache.put(key, tile)
+    response = send_file(io.BytesIO(tile.getImage()), mimetype='image/png')
+    #Tiles of a dungeon never change, so the browser can keep them
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+    
+#JSON API -> Dungeon grid, rooms, corridors and encounters (image only drawn if asked for)
+#Parameters are given in the query string, a form, or a JSON body (see apiDefaults)
+#Large custom sized dungeons are created by the job queue -> Returns the job status (202), with the URL of its JSON result
+@app.route("/api/dungeon", methods=['GET', 'POST'])
+def apiDungeon():
+    given = request.get_json(silent=True) if request.is_json else request.values.to_dict()
+    try:
+        parameters = readApiParameters(given or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    width, height = dungeonGeneration.parseDimensions(parameters["size"])
+    if width != None and width * height > maxApiCells:
+        job = jobQueue.submit(parameters)
+        if job == None:
+            return jsonify({"error": "Too many dungeons are being created, try again shortly"}), 503, {"Retry-After": "5"}
+        status = jobStatus(job)
+        status["resultUrl"] = url_for('jobResult', jobId = job.getId(), format = "json")
+        return jsonify(status), 202, {"Location": status["statusUrl"]}
+    dungeon, dunSeed = dungeonGeneration.getDungeon(parameters["size"], parameters["shape"], parameters["corridor"], parameters["seed"],
+                                                    parameters["tileset"], RoomSizing = parameters["roomSizing"], Render = parameters["image"],
+                                                    CorridorSteps = parameters["corridorSteps"])
+    enc, popSeed, partySize, partyLevel = dungeonGeneration.populateRooms(dungeon.getRooms(), parameters["popSeed"], parameters["theme"],
+                                                                          parameters["partySize"], parameters["partyLevel"], parameters["density"])
+    return jsonify(apiData(dungeon, dunSeed, enc, popSeed, partySize, partyLevel, parameters))
+
 #About page 
 @app.route("/about", methods=['GET','POST'])
 def about():
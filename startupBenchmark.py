@@ -0,0 +1,156 @@
+#   Author      -   Jack Manning
+#   Name        -   startupBenchmark.py
+#   Description -   Script to measure cold start time of the Dungeon generator.
+#                   Each measurement runs in a new Python process, so nothing is already imported or cached:
+#                       -   Import time of each module (project modules and the libraries they use)
+#                       -   Time to first Dungeon (import dungeonGeneration, then generate, render and populate one Dungeon with the cache turned off)
+#                   Usage: python startupBenchmark.py [--repeat N] [--json] [--limit MS]
+#                   --limit makes the script exit with an error if time to first Dungeon is over the limit (in ms), so it can be used to catch regressions.
+#
+#   Changelog   -   18/10/26    -   Created startup benchmark
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+#Folder holding this project -> Benchmarks run from here so relative files (e.g monster JSON) are found
+projectFolder = os.path.dirname(os.path.abspath(__file__))
+
+#Modules to time, in the order they are reported
+benchmarkModules = [
+    "numpy",
+    "scipy.special",
+    "scipy.stats",
+    "PIL.Image",
+    "flask",
+    "dungeonTracing",
+    "dungeonImports",
+    "dungeonTilesets",
+    "dungeonRendering",
+    "dungeonCache",
+    "dungeonPopulation",
+    "dungeonGeneration",
+    "server",
+]
+
+#Code run in a new process to time importing a module
+importScript = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": sorted(m for m in ("numpy", "scipy", "PIL") if m in sys.modules)}}))
+"""
+
+#Code run in a new process to time the first Dungeon
+#Caching is turned off so the Dungeon is always generated
+dungeonScript = """
+import io, json, contextlib, tempfile, time
+start = time.perf_counter()
+import dungeonGeneration
+from dungeonCache import DungeonCache
+imported = time.perf_counter()
+dungeonGeneration.dungeonCache = DungeonCache(0, tempfile.gettempdir(), 0)
+with contextlib.redirect_stdout(io.StringIO()):
+    result = dungeonGeneration.main({size!r}, {shape!r}, {corridor!r}, {seed}, 1, "Random", 4, 5, "Average", {tileset!r})
+first = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    dungeonGeneration.main({size!r}, {shape!r}, {corridor!r}, {seed}, 1, "Random", 4, 5, "Average", {tileset!r})
+second = time.perf_counter()
+print(json.dumps({{"import": imported - start, "first": first - imported, "second": second - first, "phases": result[6]}}))
+"""
+
+#Method to run a benchmark script in a new Python process
+#In -> Script source
+#Out -> Dictionary printed by script (as JSON), plus total process time
+def runScript(script):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", script], cwd=projectFolder, capture_output=True, text=True)
+    total = time.perf_counter() - start
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip())
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["process"] = total
+    return result
+
+#Method to time importing each module
+#In -> Number of repeats
+#Out -> Dictionary of module name to median import time (ms) and heavy libraries loaded by the import
+def benchmarkImports(repeat):
+    results = {}
+    for module in benchmarkModules:
+        times = []
+        heavy = []
+        for i in range(0, repeat):
+            try:
+                result = runScript(importScript.format(module=module))
+            except RuntimeError as e:
+                times = None
+                heavy = [str(e).splitlines()[-1]]
+                break
+            times.append(result["seconds"] * 1000)
+            heavy = result["heavy"]
+        results[module] = {"ms": None if times == None else statistics.median(times), "loads": heavy}
+    return results
+
+#Method to time the first and second Dungeon created by a new process
+#In -> Number of repeats, Size, Shape, Corridor algorithm, Seed, Tileset
+#Out -> Dictionary of median times (ms) and phase report of the last run
+def benchmarkFirstDungeon(repeat, size, shape, corridor, seed, tileset):
+    runs = [runScript(dungeonScript.format(size=size, shape=shape, corridor=corridor, seed=seed, tileset=tileset)) for i in range(0, repeat)]
+    return {
+        "import ms": statistics.median(run["import"] * 1000 for run in runs),
+        "first dungeon ms": statistics.median(run["first"] * 1000 for run in runs),
+        "second dungeon ms": statistics.median(run["second"] * 1000 for run in runs),
+        "time to first dungeon ms": statistics.median((run["import"] + run["first"]) * 1000 for run in runs),
+        "process ms": statistics.median(run["process"] * 1000 for run in runs),
+        "phases": runs[-1]["phases"],
+    }
+
+#Method to print results as a table
+#In -> Import results, First Dungeon results
+#Out -> None
+def printReport(imports, dungeon):
+    print("Import time (new process, median)")
+    for module, result in imports.items():
+        ms = "failed" if result["ms"] == None else "{0:9.1f} ms".format(result["ms"])
+        print("  {0:<20} {1:>12}   loads: {2}".format(module, ms, ", ".join(result["loads"]) or "-"))
+    print("")
+    print("First Dungeon (new process, median)")
+    for name in ["import ms", "first dungeon ms", "second dungeon ms", "time to first dungeon ms", "process ms"]:
+        print("  {0:<26} {1:9.1f}".format(name, dungeon[name]))
+    print("")
+    print("Phases of first Dungeon")
+    for name, phase in dungeon["phases"].items():
+        print("  {0:<20} {1:9.3f} ms  x{2}".format(name, phase["seconds"] * 1000, phase["calls"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start time of the Dungeon generator")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of new processes to run for each measurement")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--limit", type=float, default=None, help="Exit with an error if time to first Dungeon is over this many ms")
+    parser.add_argument("--size", default="3", help="Dungeon size (1 = Tiny to 4 = Large)")
+    parser.add_argument("--shape", default="Square")
+    parser.add_argument("--corridor", default="BSP")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tileset", default="Stone")
+    args = parser.parse_args()
+
+    imports = benchmarkImports(args.repeat)
+    dungeon = benchmarkFirstDungeon(args.repeat, args.size, args.shape, args.corridor, args.seed, args.tileset)
+
+    if args.json:
+        print(json.dumps({"imports": imports, "firstDungeon": dungeon}, indent=2))
+    else:
+        printReport(imports, dungeon)
+
+    if args.limit != None and dungeon["time to first dungeon ms"] > args.limit:
+        print("Time to first Dungeon {0:.1f} ms is over limit of {1:.1f} ms".format(dungeon["time to first dungeon ms"], args.limit), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
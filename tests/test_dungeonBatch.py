@@ -0,0 +1,89 @@
+#   Author      -   Jack Manning
+#   Name        -   test_dungeonBatch.py
+#   Description -   Tests for dungeonBatch.py (reading seeds and building jobs from arguments and sweep files).
+#                   Run from the project folder with: python -m unittest discover tests
+#
+#   Changelog   -   18/10/26    -   Created batch tests
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from dungeonBatch import parseSeeds, parseArguments, buildJobs
+
+class ParseSeedsTests(unittest.TestCase):
+
+    def testRangesAndSingleSeeds(self):
+        self.assertEqual(parseSeeds("1-3, 7,10-11"), [1, 2, 3, 7, 10, 11])
+
+    def testEmptyPartsAreSkipped(self):
+        self.assertEqual(parseSeeds("5,,6,"), [5, 6])
+
+    def testBackwardsRangeIsRejected(self):
+        with self.assertRaises(ValueError):
+            parseSeeds("10-5")
+
+    def testRandomSeedIsRejected(self):
+        with self.assertRaises(ValueError):
+            parseSeeds("0-3")
+        with self.assertRaises(ValueError):
+            parseSeeds("0")
+
+    def testTextIsRejected(self):
+        with self.assertRaises(ValueError):
+            parseSeeds("one")
+
+class BuildJobsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    #Method to write a sweep file
+    #In -> Sweep (list of parameter sets)
+    #Out -> Path of sweep file
+    def writeSweep(self, sweep):
+        path = os.path.join(self.folder, "sweep.json")
+        with open(path, "w") as f:
+            json.dump(sweep, f)
+        return path
+
+    def testSeedRangeUsesCommandLineParameters(self):
+        jobs = buildJobs(parseArguments(["--seeds", "1-3", "--out", self.folder, "--size", "4", "--corridor-steps", "legacy"]))
+        self.assertEqual([job["seed"] for job in jobs], [1, 2, 3])
+        for job in jobs:
+            self.assertEqual(job["size"], "4")
+            self.assertEqual(job["corridorSteps"], "legacy")
+            #Population seed matches Dungeon seed when not given
+            self.assertEqual(job["popSeed"], job["seed"])
+
+    def testPopulationSeedCanBeGiven(self):
+        jobs = buildJobs(parseArguments(["--seeds", "1-2", "--out", self.folder, "--pop-seed", "99"]))
+        self.assertEqual([job["popSeed"] for job in jobs], [99, 99])
+
+    def testSweepEntriesOverrideCommandLine(self):
+        path = self.writeSweep([{"seeds": "1-2", "size": 3, "corridor": "Drunkard"}, {"seed": 5, "popSeed": 7}])
+        jobs = buildJobs(parseArguments(["--sweep", path, "--out", self.folder, "--corridor", "BSP"]))
+        self.assertEqual([(job["seed"], job["size"], job["corridor"], job["popSeed"]) for job in jobs],
+                         [(1, "3", "Drunkard", 1), (2, "3", "Drunkard", 2), (5, "2", "BSP", 7)])
+
+    def testDuplicateJobsAreRemoved(self):
+        path = self.writeSweep([{"seeds": "1-3"}, {"seed": 2}])
+        jobs = buildJobs(parseArguments(["--sweep", path, "--out", self.folder]))
+        self.assertEqual([job["seed"] for job in jobs], [1, 2, 3])
+
+    def testSweepRandomSeedIsRejected(self):
+        path = self.writeSweep([{"seed": 0}])
+        with self.assertRaises(ValueError):
+            buildJobs(parseArguments(["--sweep", path, "--out", self.folder]))
+
+    def testUnknownSweepParameterIsRejected(self):
+        path = self.writeSweep([{"seed": 1, "colour": "red"}])
+        with self.assertRaises(ValueError):
+            buildJobs(parseArguments(["--sweep", path, "--out", self.folder]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#   Author      -   Jack Manning
+#   Name        -   test_dungeonCache.py
+#   Description -   Tests for dungeonCache.py (cache keys, disk cache writing and eviction).
+#                   Run from the project folder with: python -m unittest discover tests
+#
+#   Changelog   -   18/10/26    -   Created cache tests
+
+import os
+import shutil
+import tempfile
+import unittest
+from dungeonCache import cacheKey, DiskCache, DungeonCache
+
+#Entry stored in the caches during tests
+class TestEntry:
+
+    #Constructor
+    #In -> Data (bytes)
+    def __init__(self, Data):
+        self.data = Data
+
+    def getSize(self):
+        return len(self.data)
+
+class CacheKeyTests(unittest.TestCase):
+
+    def testSameParametersGiveSameKey(self):
+        self.assertEqual(cacheKey("3", "Square", "BSP", 42, "Stone"), cacheKey("3", "Square", "BSP", 42, "Stone"))
+
+    def testSeedTextAndNumberGiveSameKey(self):
+        self.assertEqual(cacheKey("3", "Square", "BSP", "42", "Stone"), cacheKey(3, "Square", "BSP", 42, "Stone"))
+
+    def testEachParameterChangesKey(self):
+        base = ("3", "Square", "BSP", 42, "Stone")
+        changed = [("4", "Square", "BSP", 42, "Stone"), ("3", "Rectangle", "BSP", 42, "Stone"), ("3", "Square", "Drunkard", 42, "Stone"),
+                   ("3", "Square", "BSP", 43, "Stone"), ("3", "Square", "BSP", 42, "Grass")]
+        keys = set(cacheKey(*parameters) for parameters in changed)
+        keys.add(cacheKey(*base))
+        self.assertEqual(len(keys), len(changed) + 1)
+
+class DiskCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testEntryIsReadBack(self):
+        cache = DiskCache(self.folder, 1024 * 1024)
+        cache.put("key", TestEntry(b"dungeon"))
+        self.assertEqual(cache.get("key").data, b"dungeon")
+        self.assertIsNone(cache.get("missing"))
+        #No temporary files are left behind
+        self.assertEqual(os.listdir(self.folder), ["key.pickle"])
+
+    def testOldestEntriesAreRemovedOverLimit(self):
+        cache = DiskCache(self.folder, 2500)
+        for i in range(0, 10):
+            cache.put("key{0}".format(i), TestEntry(bytes(1000)))
+        sizes = [os.path.getsize(os.path.join(self.folder, name)) for name in os.listdir(self.folder)]
+        self.assertLessEqual(sum(sizes), 2500)
+        self.assertEqual(cache.currentBytes, sum(sizes))
+        self.assertIsNotNone(cache.get("key9"))
+
+    def testDiskCanBeSkipped(self):
+        cache = DungeonCache(1024 * 1024, self.folder, 1024 * 1024)
+        cache.put("memory", TestEntry(b"random seed"), False)
+        self.assertEqual(os.listdir(self.folder), [])
+        self.assertEqual(cache.get("memory").data, b"random seed")
+
+if __name__ == "__main__":
+    unittest.main()
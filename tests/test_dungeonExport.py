@@ -0,0 +1,58 @@
+#   Author      -   Jack Manning
+#   Name        -   test_dungeonExport.py
+#   Description -   Tests for dungeonExport.py (grid encodings read back to the same grid).
+#                   Run from the project folder with: python -m unittest discover tests
+#
+#   Changelog   -   18/10/26    -   Created export tests
+
+import base64
+import unittest
+import numpy as np
+from dungeonExport import runLengthEncode, gridData
+
+#Method to read a run-length encoded grid back into a flat array
+#In -> List of value, count pairs
+#Out -> Flat array
+def runLengthDecode(pairs):
+    return np.repeat(np.array(pairs[0::2], dtype=np.uint8), pairs[1::2])
+
+#Method to read grid data back into a grid
+#In -> Dictionary of grid data (see gridData)
+#Out -> Grid (2D array, grid[x][y])
+def readGridData(data):
+    if data["encoding"] == "rle":
+        flat = runLengthDecode(data["data"])
+    else:
+        flat = np.frombuffer(base64.b64decode(data["data"]), dtype=np.uint8)
+    return flat.reshape(data["width"], data["height"])
+
+class RunLengthTests(unittest.TestCase):
+
+    def testRunsAreCounted(self):
+        self.assertEqual(runLengthEncode([[0, 0, 5], [5, 5, 1]]), [0, 2, 5, 3, 1, 1])
+
+    def testEmptyGrid(self):
+        self.assertEqual(runLengthEncode(np.zeros((0, 0))), [])
+
+    def testSingleValueGrid(self):
+        self.assertEqual(runLengthEncode(np.full((4, 3), 7)), [7, 12])
+
+class GridDataTests(unittest.TestCase):
+
+    def setUp(self):
+        #Wider than high so a swapped width and height would not read back
+        self.grid = np.random.RandomState(1).randint(0, 25, size=(37, 21)).astype(np.uint8)
+        self.grid[5:20, 3:9] = 0
+
+    def testEncodingsReadBack(self):
+        for encoding in ["rle", "base64"]:
+            data = gridData(self.grid, encoding)
+            self.assertEqual((data["width"], data["height"]), (37, 21))
+            self.assertTrue(np.array_equal(readGridData(data), self.grid), encoding)
+
+    def testUnknownEncoding(self):
+        with self.assertRaises(ValueError):
+            gridData(self.grid, "png")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#   Author      -   Jack Manning
+#   Name        -   test_dungeonGeneration.py
+#   Description -   Tests for dungeonGeneration.py (custom sized Dungeons created in chunks).
+#                   Run from the project folder with: python -m unittest discover tests
+#
+#   Changelog   -   18/10/26    -   Created chunk tests
+
+import random
+import unittest
+from unittest import mock
+import numpy as np
+from scipy import ndimage
+import dungeonGeneration
+from dungeonGeneration import chunkLayout, parseDimensions, Dungeon
+
+#Method to create a custom sized Dungeon from a seed
+#In -> Size, Seed, Number of worker processes
+#Out -> Dungeon
+def createDungeon(Size, Seed, Workers = 1):
+    return Dungeon(Size, "Square", "BSP", "Stone", RoomSizing = "batch", Rng = random.Random(Seed), NumpyRng = np.random.RandomState(Seed), Workers = Workers)
+
+class ChunkLayoutTests(unittest.TestCase):
+
+    def testChunksMeetOnChunkBoundaries(self):
+        self.assertEqual(chunkLayout(256, 128), [(0, 0, 128, 128), (128, 0, 128, 128)])
+        self.assertEqual(chunkLayout(384, 256), [(x, y, 128, 128) for x in (0, 128, 256) for y in (0, 128)])
+
+    def testChunksCoverDungeon(self):
+        for width, height in ((255, 129), (256, 256), (257, 383), (32, 500)):
+            chunks = chunkLayout(width, height)
+            self.assertEqual(sum(w * h for x, y, w, h in chunks), width * height)
+            self.assertTrue(all(w >= min(width, dungeonGeneration.chunkSize) and h >= min(height, dungeonGeneration.chunkSize) for x, y, w, h in chunks))
+
+    def testCustomSizeLimits(self):
+        self.assertEqual(parseDimensions("256x128"), (256, 128))
+        self.assertEqual(parseDimensions("3"), (None, None))
+        with self.assertRaises(ValueError):
+            parseDimensions("16x256")
+        with self.assertRaises(ValueError):
+            parseDimensions("{0}x256".format(dungeonGeneration.maximumCustomSize + 1))
+
+class ChunkStitchingTests(unittest.TestCase):
+
+    def testRoomsStayInsideDungeon(self):
+        dungeon = createDungeon("384x256", 7)
+        for room in dungeon.getRooms():
+            self.assertGreaterEqual(room.getX(), 0)
+            self.assertGreaterEqual(room.getY(), 0)
+            self.assertLessEqual(room.getX() + room.getWidth(), 384)
+            self.assertLessEqual(room.getY() + room.getHeight(), 256)
+
+    def testEveryChunkIsJoined(self):
+        dungeon = createDungeon("256x256", 3)
+        grid = np.array(dungeon.getGrid().getGrid())
+        self.assertEqual(grid.shape, (256, 256))
+        #Every room and corridor tile is reachable from every other
+        labels, count = ndimage.label(grid != 0)
+        self.assertEqual(count, 1)
+        #Each chunk has rooms
+        for x, y, w, h in chunkLayout(256, 256):
+            self.assertTrue(np.any(grid[x:x + w, y:y + h] != 0))
+
+    def testSameSeedGivesSameDungeon(self):
+        first = np.array(createDungeon("256x256", 11).getGrid().getGrid())
+        second = np.array(createDungeon("256x256", 11).getGrid().getGrid())
+        self.assertTrue(np.array_equal(first, second))
+
+    def testWorkersGiveSameDungeon(self):
+        #Enough chunks for worker processes to be used, even on a machine with one core
+        size = "{0}x{1}".format(dungeonGeneration.chunkSize * 4, dungeonGeneration.chunkSize * 4)
+        serial = np.array(createDungeon(size, 5).getGrid().getGrid())
+        with mock.patch.object(dungeonGeneration.os, "cpu_count", return_value=4):
+            parallel = np.array(createDungeon(size, 5, Workers = 4).getGrid().getGrid())
+        self.assertTrue(np.array_equal(serial, parallel))
+
+if __name__ == "__main__":
+    unittest.main()